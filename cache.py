@@ -0,0 +1,110 @@
+"""Per instance caches shared by concurrent requests of threadsafe instance."""
+
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Bounded least recently used cache with time to live of entries. Safe to use from concurrent threads.
+    It is bounded by number of entries and optionally by total size of entries given to set().
+    Values loaded before the latest invalidate() or clear() are not stored by set() when the generation read
+    before loading is given, so concurrent request can not put back stale value of just changed document.
+    """
+
+    def __init__(self, max_size=1000, ttl=60, max_bytes=None, clock=time.time):
+        """
+        :param max_size: maximum number of entries or None
+        :param ttl: seconds after which entry expires
+        :param max_bytes: maximum sum of sizes of entries or None
+        :param clock: function returning current time in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expiration time, value, size), the most recently used last
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns cached value or None if there is no value or it expired"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and entry[0] <= self._clock():
+                self._bytes -= entry[2]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[1]
+
+    def generation(self):
+        """Returns number of invalidations so far. Read it before loading the value which will be set()"""
+        return self._generation
+
+    def set(self, key, value, generation=None, size=0):
+        """
+        Stores value unless the cache was invalidated after generation was read or size alone exceeds max_bytes
+        :param key:
+        :param value:
+        :param generation: value of generation() read before loading value
+        :param size: size of value counted against max_bytes e.g. length of serialized value
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._remove(key)
+            self._entries[key] = (self._clock() + self.ttl, value, size)
+            self._bytes += size
+            while (self.max_size is not None and len(self._entries) > self.max_size) or \
+                    (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._bytes -= self._entries.popitem(last=False)[1][2]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Returns dictionary with hits, misses, size and bytes"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "bytes": self._bytes}
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+
+_write_generations = {}
+_write_generations_lock = threading.Lock()
+
+
+def get_write_generation(index_name):
+    """
+    Returns number of writes to index made by this instance. Used in keys of cached query results
+    so results cached before the latest write are not used anymore.
+    """
+    return _write_generations.get(index_name, 0)
+
+
+def bump_write_generation(index_name):
+    """Call after every write to index to make cached query results of the index outdated"""
+    with _write_generations_lock:
+        _write_generations[index_name] = _write_generations.get(index_name, 0) + 1
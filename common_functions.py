@@ -1,5 +1,49 @@
 import string
 import json
+import binascii
+import hashlib
+import logging
+import os
+import time
+import zlib
+from collections import deque
+from search_backend import search
+from cache import LRUCache
+
+DEFAULT_PAGE_LIMIT = 20
+GET_PARAMETERS = ['query', 'limit', 'cursor', 'stream', 'ids', 'fields']
+MAXIMUM_IDS_PER_REQUEST = 1000
+# JSON bodies of at least GZIP_MINIMUM_BYTES are compressed for clients accepting gzip, streamed bodies always
+GZIP_MINIMUM_BYTES = 1024
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+_GZIP_CACHE_BYTES = 8 * 1024 * 1024
+# field with JSON of the whole document stored at index time
+JSON_FIELD = 'documentJson'
+# search.Document is max 1 MB. JSON is hex encoded into 2 bytes per byte and stored next to the declared fields, which
+# take at most as many bytes as their JSON, so the document is about 3 times the JSON plus date, hashes and names
+_MAXIMUM_DOCUMENT_BYTES = 1024 * 1024
+_OTHER_FIELDS_BYTES = 1024
+_MAXIMUM_JSON_FIELD_BYTES = (_MAXIMUM_DOCUMENT_BYTES - _OTHER_FIELDS_BYTES) // 3
+# field with hash of the record, documents with the same hash as the indexed one are not indexed again
+HASH_FIELD = 'contentHash'
+# field with hash of doc_id searched to find indexed documents, doc_id itself can have up to 500 characters
+# including the query syntax ones while its hash has always 32 hex digits
+ID_HASH_FIELD = 'idHash'
+# query string is max 2000 characters, 40 id hashes with field names fit into it
+_IDS_PER_QUERY = 40
+UPSERT_SEARCHES_IN_FLIGHT = 10
+UPSERT_CREATED = 'created'
+UPSERT_UPDATED = 'updated'
+UPSERT_UNCHANGED = 'unchanged'
+FORMAT_JSON = 'application/json'
+FORMAT_NDJSON = 'application/x-ndjson'
+_CONTENT_TYPES = {
+    FORMAT_JSON: 'application/json; charset=utf-8',
+    FORMAT_NDJSON: 'application/x-ndjson; charset=utf-8'
+}
+# compressed bodies by ETag so cached query results are compressed only once
+gzip_cache = LRUCache(max_size=None, ttl=60, max_bytes=_GZIP_CACHE_BYTES)
+
 
 def has_no_whitespaces(my_string):
     for my_char in my_string:
@@ -8,6 +52,169 @@ def has_no_whitespaces(my_string):
     return True
 
 
+def is_visible_ascii(my_string):
+    """Checks if all characters are printable ASCII except whitespaces"""
+    for my_char in my_string:
+        if not '!' <= my_char <= '~':
+            return False
+    return True
+
+
+def add_cors_headers(response):
+    """Adds the CORS headers every endpoint of this API returns"""
+    response.headers.add_header("Access-Control-Allow-Origin", "*")
+    response.headers.add_header('Access-Control-Allow-Methods', 'POST, GET, DELETE, PUT, OPTIONS')
+    response.headers.add_header('Access-Control-Allow-Headers', 'Content-Type, api_key, Authorization, ' +
+                                'x-requested-with, Total-Count, Total-Pages, Error-Message')
+
+
+def make_etag(body):
+    """Returns strong entity tag of response body"""
+    return hashlib.md5(body).hexdigest()
+
+
+def accepts_gzip(request):
+    """Checks if Accept-Encoding header of the request allows gzip"""
+    return 'gzip' in request.accept_encoding
+
+
+def gzip_body(body, level=None):
+    """Returns body compressed to gzip format"""
+    if level is None:
+        level = GZIP_LEVEL
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+
+def iter_gzip(chunks, level=None):
+    """
+    Compresses chunks to one gzip stream. Every chunk is flushed, so every page of a streamed body can be decoded
+    as soon as it arrives where the server sends chunks as they are yielded.
+    :param chunks: iterable of str
+    :param level: compression level 1-9, GZIP_LEVEL by default
+    :rtype: generator: str chunks of gzip stream
+    """
+    if level is None:
+        level = GZIP_LEVEL
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def negotiate_format(request):
+    """
+    Returns format of list responses preferred by Accept header of the request, JSON if none of the formats is
+    acceptable or there is no Accept header
+    :rtype: str: FORMAT_JSON or FORMAT_NDJSON
+    """
+    return request.accept.best_match([FORMAT_JSON, FORMAT_NDJSON]) or FORMAT_JSON
+
+
+def encode_records(records, body_format=FORMAT_JSON):
+    """Serializes list of dictionaries to body_format. JSON is an array, NDJSON is one record per line."""
+    if body_format == FORMAT_NDJSON:
+        return ''.join([json.dumps(record) + '\n' for record in records])
+    return json.dumps(records)
+
+
+def iter_records(document_pages, resource_type, body_format=FORMAT_JSON, fields=None):
+    """
+    Encodes pages of documents as dictionaries returned by <resource_type>.document_to_record() in body_format,
+    page by page like iter_json_array() and with the same result as encode_records()
+    :param document_pages: iterable of lists of search.Document e.g. iter_document_pages()
+    :param resource_type: resource_types.ResourceType of the documents
+    :param body_format: FORMAT_JSON or FORMAT_NDJSON
+    :param fields: list of names of the only fields to encode or None for all fields
+    :rtype: generator: str chunks of body
+    """
+    if body_format == FORMAT_JSON:
+        for chunk in iter_json_array(document_pages, resource_type, fields):
+            yield chunk
+        return
+    for page in document_pages:
+        if page:
+            if fields is None:
+                yield ''.join([resource_type.document_to_json(document) + '\n' for document in page])
+            else:
+                yield encode_records([resource_type.document_to_record(document, fields) for document in page],
+                                     body_format)
+
+
+def write_json(request, response, body, etag=None, body_format=FORMAT_JSON):
+    """
+    Writes JSON response body with ETag header. If the request If-None-Match header contains the same ETag
+    only 304 Not Modified is returned without the body. Body of at least GZIP_MINIMUM_BYTES is compressed
+    if the client accepts gzip, then it has its own ETag.
+    :param request:
+    :param response:
+    :param body: str: serialized JSON or NDJSON
+    :param etag: make_etag(body) if it was computed before
+    :param body_format: FORMAT_JSON or FORMAT_NDJSON
+    """
+    if etag is None:
+        etag = make_etag(body)
+    add_cors_headers(response)
+    # clients have to revalidate but can do it with If-None-Match
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+    compress = len(body) >= GZIP_MINIMUM_BYTES and accepts_gzip(request)
+    if compress:
+        # compressed representation has different entity tag
+        etag += '-gzip'
+    response.etag = etag
+    if etag in request.if_none_match:
+        response.status = 304
+        # 304 has no content so it has no content type
+        response.headers.pop('Content-Type', None)
+        return
+    response.headers['Content-Type'] = _CONTENT_TYPES[body_format]
+    response.status = 200
+    if compress:
+        compressed_body = gzip_cache.get((etag, GZIP_LEVEL))
+        if compressed_body is None:
+            compressed_body = gzip_body(body)
+            gzip_cache.set((etag, GZIP_LEVEL), compressed_body, size=len(compressed_body))
+        response.headers['Content-Encoding'] = 'gzip'
+        body = compressed_body
+    response.out.write(body)
+
+
+def write_json_stream(request, response, chunks, body_format=FORMAT_JSON):
+    """
+    Writes JSON response body chunk by chunk while it is being encoded, compressed by gzip if the client accepts it.
+    The python27 runtime of App Engine buffers the whole body before sending it, so there it saves memory of
+    the encoded list but not the time to the first byte.
+    :param request:
+    :param response:
+    :param chunks: iterable of str chunks of JSON or NDJSON e.g. iter_records()
+    :param body_format: FORMAT_JSON or FORMAT_NDJSON
+    """
+    add_cors_headers(response)
+    response.headers['Content-Type'] = _CONTENT_TYPES[body_format]
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+    response.status = 200
+    if accepts_gzip(request):
+        response.headers['Content-Encoding'] = 'gzip'
+        chunks = iter_gzip(chunks)
+    response.app_iter = chunks
+
+
+def write_error(response, code, message):
+    """Writes JSON error in the format described in swagger Error definition"""
+    data = {
+        "code": code,
+        "fields": "string",
+        "message": message
+    }
+    add_cors_headers(response)
+    response.headers['Content-Type'] = 'application/json; charset=utf-8'
+    response.status = code
+    json.dump(data, response.out)
+
+
 def handle_404(request, response, exception):
     """Handles not found error"""
     data = {
@@ -21,4 +228,521 @@ def handle_404(request, response, exception):
                                 'x-requested-with, Total-Count, Total-Pages, Error-Message')
     response.headers['Content-Type'] = 'application/json; charset=utf-8'
     response.status = 404
-    json.dump(data, response.out)
\ No newline at end of file
+    json.dump(data, response.out)
+
+
+def json_field(record):
+    """
+    Returns field with record serialized to JSON at index time, so read paths can splice it into responses instead of
+    building and encoding dictionary of every document. Search API has no unindexed fields, so JSON is hex encoded
+    into one token which no word of a query matches.
+    :param record: dictionary of all fields except date field
+    :rtype: search.TextField or None if the JSON is too large
+    """
+    record_json = json.dumps(record)
+    if len(record_json) > _MAXIMUM_JSON_FIELD_BYTES:
+        return None
+    return search.TextField(name=JSON_FIELD, value=binascii.hexlify(record_json))
+
+
+def id_hash_field(doc_id):
+    """
+    Returns field with hash of doc_id by which find_indexed_hashes() searches the document
+    :param doc_id:
+    :rtype: search.AtomField
+    """
+    if isinstance(doc_id, unicode):
+        doc_id = doc_id.encode('utf-8')
+    return search.AtomField(name=ID_HASH_FIELD, value=hashlib.md5(doc_id).hexdigest())
+
+
+def hash_field(record):
+    """
+    Returns field with hash of the record, it does not depend on the date of indexing
+    :param record: dictionary of all fields except date field
+    :rtype: search.AtomField
+    """
+    return search.AtomField(name=HASH_FIELD, value=hashlib.md5(json.dumps(record, sort_keys=True)).hexdigest())
+
+
+def stored_json(document):
+    """Returns JSON stored in JSON_FIELD of search.Document or None if the document was indexed without it"""
+    for field in document.fields:
+        if field.name == JSON_FIELD:
+            return binascii.unhexlify(field.value)
+    return None
+
+
+def iter_json_document_pages(index_object, query_string='', sort_options_object=None):
+    """
+    Yields all documents found in the Full Text Search database page after page with JSON_FIELD.
+    Without query_string and sort_options_object whole documents are read by get_range, see iter_document_pages().
+    Search returns only JSON_FIELD and documents indexed without it are fetched whole by concurrent gets.
+    :param index_object:
+    :param query_string:
+    :param sort_options_object:
+    :rtype: generator: lists of search.Document
+    """
+    for page in iter_document_pages(index_object, query_string, sort_options_object, returned_fields=[JSON_FIELD]):
+        missing_ids = [document.doc_id for document in page if not document.fields]
+        if missing_ids:
+            whole_documents = dict(zip(missing_ids, get_documents(index_object, missing_ids)))
+            page = [whole_documents.get(document.doc_id) or document for document in page]
+        yield page
+
+
+def parse_fields_parameter(q, field_names):
+    """
+    Reads comma separated list of field names from parsed query string
+    :param q: dict returned by urlparse.parse_qs
+    :param field_names: names of fields which can be requested
+    :rtype: list: field names without duplicates or None if fields parameter is not given
+    :raises ValueError: if any field name is not in field_names
+    """
+    if 'fields' not in q.keys():
+        return None
+    fields = []
+    for field_name in q['fields'][0].split(','):
+        if field_name not in field_names:
+            raise ValueError('unknown field')
+        if field_name not in fields:
+            fields.append(field_name)
+    return fields
+
+
+def projection_options(fields, id_key):
+    """
+    Returns options making the search service return only requested fields. Field id_key is not requested
+    because <resource_type>.document_to_record() takes it from doc_id, so for fields=[id_key] only doc_ids are returned.
+    :param fields: list of field names or None for all fields
+    :param id_key: name of the field equal to doc_id
+    :rtype: tuple: (returned_fields list or None, ids_only)
+    """
+    if fields is None:
+        return None, False
+    returned_fields = [field_name for field_name in fields if field_name != id_key]
+    if not returned_fields:
+        return None, True
+    return returned_fields, False
+
+
+DOCUMENTS_PAGE_SIZE = 100
+PREFETCH_DEPTH = 1
+
+
+def iter_document_pages(index_object, query_string='', sort_options_object=None, page_size=DOCUMENTS_PAGE_SIZE,
+                        prefetch=PREFETCH_DEPTH, returned_fields=None, ids_only=False):
+    """
+    Yields all documents found in the Full Text Search database page after page.
+    Without query_string and sort_options_object <index_object>.get_range_async() is used and iterated from the last
+    returned doc_id, so the listing is in ascending doc_id order, otherwise search cursor is followed with
+    <index_object>.search_async() in the order of rank. get_range cannot return only some fields, so it ignores
+    returned_fields and documents are projected by <resource_type>.document_to_record().
+    Every request needs doc_id or cursor returned by the previous one, so only one request can be in flight.
+    With prefetch > 0 it is sent before the current page is yielded, so its latency overlaps with converting and
+    serializing the current page, and it fetches the next prefetch pages at once (max 1000 documents).
+    :param index_object:
+    :param query_string:
+    :param sort_options_object:
+    :param page_size: number of documents in yielded lists
+    :param prefetch: number of pages fetched ahead of the yielded one, 0 fetches page by page when it is needed
+    :param returned_fields: list of names of the only fields returned by search or None for all fields
+    :param ids_only: if True documents contain only doc_id
+    :rtype: generator: lists of search.Document
+    """
+    fetch_limit = min(page_size * max(prefetch, 1), search.MAXIMUM_DOCUMENTS_RETURNED_PER_SEARCH)
+    if query_string == '' and sort_options_object is None:
+        def fetch(previous_results):
+            if previous_results is None:
+                return index_object.get_range_async(limit=fetch_limit, ids_only=ids_only)
+            if len(previous_results.results) == 0:
+                # stop if there are no more documents
+                return None
+            return index_object.get_range_async(start_id=previous_results.results[-1].doc_id,
+                                                include_start_object=False, limit=fetch_limit, ids_only=ids_only)
+    else:
+        def fetch(previous_results):
+            if previous_results is None:
+                cursor = search.Cursor()
+            else:
+                cursor = previous_results.cursor
+            if not cursor:
+                return None
+            query_options = search.QueryOptions(limit=fetch_limit, cursor=cursor, sort_options=sort_options_object,
+                                                returned_fields=returned_fields, ids_only=ids_only)
+            return index_object.search_async(search.Query(query_string=query_string, options=query_options))
+
+    future = fetch(None)
+    while future is not None:
+        results = future.get_result()
+        if prefetch > 0:
+            future = fetch(results)
+        documents = results.results
+        for start in range(0, len(documents), page_size):
+            yield documents[start:start + page_size]
+        if prefetch == 0:
+            future = fetch(results)
+
+
+def normalize_query_string(query_string):
+    """Returns query_string with whitespaces collapsed so equivalent queries share cache entries"""
+    return ' '.join(query_string.split())
+
+
+def sort_options_key(sort_options_object):
+    """Returns hashable description of search.SortOptions for cache keys"""
+    if sort_options_object is None:
+        return None
+    return (tuple([(expression.expression, expression.direction, expression.default_value)
+                   for expression in sort_options_object.expressions]),
+            sort_options_object.match_scorer.__class__.__name__,
+            sort_options_object.limit)
+
+
+def iter_json_array(document_pages, resource_type, fields=None):
+    """
+    Encodes pages of documents as one JSON array of dictionaries returned by <resource_type>.document_to_record().
+    Every page is encoded as soon as it arrives so only one page is kept in memory.
+    Without fields JSON stored in JSON_FIELD of the documents is used as it is.
+    :param document_pages: iterable of lists of search.Document e.g. iter_document_pages()
+    :param resource_type: resource_types.ResourceType of the documents
+    :param fields: list of names of the only fields to encode or None for all fields
+    :rtype: generator: str chunks of JSON array
+    """
+    yield '['
+    separator = ''
+    for page in document_pages:
+        if page:
+            if fields is None:
+                page_json = ', '.join([resource_type.document_to_json(document) for document in page])
+            else:
+                page_json = ', '.join([json.dumps(resource_type.document_to_record(document, fields))
+                                       for document in page])
+            yield separator + page_json
+            separator = ', '
+    yield ']'
+
+
+GETS_IN_FLIGHT = 50
+
+
+def get_documents(index_object, doc_ids, gets_in_flight=GETS_IN_FLIGHT):
+    """
+    Retrieves many documents by doc_id. Up to gets_in_flight <index_object>.get_async() calls run at once, the next
+    one is issued as soon as the oldest one finishes, so the lookups run concurrently without one RPC per id
+    of a 1000 ids request in flight.
+    :param index_object:
+    :param doc_ids: list of doc_id
+    :param gets_in_flight: maximum number of gets not finished yet
+    :rtype: list: search.Document or None if not found for every doc_id in the same order
+    """
+    documents = []
+    pending = deque()
+    for doc_id in doc_ids:
+        while len(pending) >= gets_in_flight:
+            documents.append(pending.popleft().get_result())
+        pending.append(index_object.get_async(doc_id))
+    while pending:
+        documents.append(pending.popleft().get_result())
+    return documents
+
+
+def parse_ids_parameter(q, is_id):
+    """
+    Reads comma separated list of ids from parsed query string
+    :param q: dict returned by urlparse.parse_qs
+    :param is_id: function checking if id is legitimate
+    :rtype: list: ids without duplicates in the order of the first appearance
+    :raises ValueError: if any id is not legitimate or there are more than MAXIMUM_IDS_PER_REQUEST ids
+    """
+    ids = []
+    for doc_id in q['ids'][0].split(','):
+        if not is_id(doc_id):
+            raise ValueError('malformed id')
+        if doc_id not in ids:
+            ids.append(doc_id)
+    if len(ids) > MAXIMUM_IDS_PER_REQUEST:
+        raise ValueError('too many ids')
+    return ids
+
+
+def put_documents(index_object, documents):
+    """
+    Indexes documents in batches of search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST.
+    Document with doc_id already present in the batch starts a new batch so that the later one overwrites
+    the earlier one just like separate puts would.
+    :param index_object:
+    :param documents: list of search.Document
+    :rtype: list: search.PutResult for every document in the same order as documents
+    """
+    put_results = []
+    batch = []
+    batch_ids = set()
+    for document in documents + [None]:
+        if document is None or len(batch) == search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST or \
+                document.doc_id in batch_ids:
+            if batch:
+                try:
+                    put_results.extend(index_object.put(batch))
+                except search.PutError as e:
+                    put_results.extend(e.results)
+            batch = []
+            batch_ids = set()
+        if document is not None:
+            batch.append(document)
+            batch_ids.add(document.doc_id)
+    return put_results
+
+
+def _field_value(document, field_name):
+    for field in document.fields:
+        if field.name == field_name:
+            return field.value
+    return None
+
+
+def find_indexed_hashes(index_object, doc_ids, searches_in_flight=UPSERT_SEARCHES_IN_FLIGHT):
+    """
+    Finds indexed documents by ID_HASH_FIELD, _IDS_PER_QUERY doc_ids per search returning only HASH_FIELD,
+    so one search tells both if the documents exist and if they changed. Up to searches_in_flight
+    <index_object>.search_async() calls run at once. Documents indexed without ID_HASH_FIELD are not found.
+    :param index_object:
+    :param doc_ids: list of doc_id without duplicates
+    :param searches_in_flight: maximum number of searches not finished yet
+    :rtype: dict: HASH_FIELD value or None if the document has no hash for every found doc_id
+    """
+    requested_ids = set(doc_ids)
+    id_hashes = sorted(set(id_hash_field(doc_id).value for doc_id in doc_ids))
+    indexed_hashes = {}
+    pending = deque()
+
+    def finish_search():
+        for found_document in pending.popleft().get_result():
+            # document of other doc_id with colliding hash is not the one looked for
+            if found_document.doc_id in requested_ids:
+                indexed_hashes[found_document.doc_id] = _field_value(found_document, HASH_FIELD)
+
+    for start in range(0, len(id_hashes), _IDS_PER_QUERY):
+        chunk = id_hashes[start:start + _IDS_PER_QUERY]
+        query_options = search.QueryOptions(limit=len(chunk), returned_fields=[HASH_FIELD])
+        query_string = ' OR '.join('%s:%s' % (ID_HASH_FIELD, value) for value in chunk)
+        while len(pending) >= searches_in_flight:
+            finish_search()
+        pending.append(index_object.search_async(search.Query(query_string=query_string, options=query_options)))
+    while pending:
+        finish_search()
+    return indexed_hashes
+
+
+def upsert_documents(index_object, documents):
+    """
+    Indexes documents except the unchanged ones which have the same HASH_FIELD as the indexed document of the same
+    doc_id, so re-posting the same documents costs one search per _IDS_PER_QUERY documents instead of indexing.
+    The same searches tell created from updated documents, see find_indexed_hashes(). Documents indexed without
+    ID_HASH_FIELD are not found, so they are indexed again and reported as created.
+    :param index_object:
+    :param documents: list of search.Document with HASH_FIELD and ID_HASH_FIELD
+    :rtype: list: tuples (search.PutResult, UPSERT_CREATED, UPSERT_UPDATED or UPSERT_UNCHANGED) for every document
+     in the same order as documents
+    """
+    doc_ids = list(set(document.doc_id for document in documents))
+    # hashes of documents as they will be after the earlier documents of the list are indexed
+    current_hashes = find_indexed_hashes(index_object, doc_ids)
+    statuses = []
+    changed_documents = []
+    for document in documents:
+        content_hash = _field_value(document, HASH_FIELD)
+        if document.doc_id not in current_hashes:
+            statuses.append(UPSERT_CREATED)
+        elif content_hash is not None and content_hash == current_hashes[document.doc_id]:
+            statuses.append(UPSERT_UNCHANGED)
+            continue
+        else:
+            statuses.append(UPSERT_UPDATED)
+        current_hashes[document.doc_id] = content_hash
+        changed_documents.append(document)
+    put_results = iter(put_documents(index_object, changed_documents))
+    results = []
+    for document, status in zip(documents, statuses):
+        if status == UPSERT_UNCHANGED:
+            results.append((search.PutResult(code=search.OperationResult.OK, id=document.doc_id), status))
+        else:
+            results.append((next(put_results), status))
+    return results
+
+
+def add_upsert_headers(response, statuses):
+    """Adds Created-Count, Updated-Count and Unchanged-Count headers counting statuses of upsert_documents()"""
+    response.headers['Created-Count'] = str(statuses.count(UPSERT_CREATED))
+    response.headers['Updated-Count'] = str(statuses.count(UPSERT_UPDATED))
+    response.headers['Unchanged-Count'] = str(statuses.count(UPSERT_UNCHANGED))
+    response.headers.add_header('Access-Control-Expose-Headers', 'Created-Count, Updated-Count, Unchanged-Count')
+
+
+def delete_documents(index_object, doc_ids):
+    """
+    Deletes documents in batches of search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST with one delete RPC per batch.
+    The search service deletes nonexistent doc_ids successfully.
+    :param index_object:
+    :param doc_ids: list of doc_id
+    :rtype: list: search.DeleteResult for every doc_id in the same order as doc_ids
+    """
+    delete_results = []
+    for start in range(0, len(doc_ids), search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST):
+        try:
+            delete_results.extend(index_object.delete(doc_ids[start:start + search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST]))
+        except search.DeleteError as e:
+            delete_results.extend(e.results)
+    return delete_results
+
+
+DELETE_BATCHES_IN_FLIGHT = 4
+
+
+def delete_all_documents(index_object, batches_in_flight=DELETE_BATCHES_IN_FLIGHT, progress=None):
+    """
+    Deletes all documents of index. Next page of ids is fetched by get_range_async while up to batches_in_flight
+    delete_async batches of current and previous pages are running, so the RPCs overlap instead of waiting in turn.
+    Documents not deleted by their batch are deleted once more at the end, the ones failing again are counted
+    as failed.
+    :param index_object:
+    :param batches_in_flight: maximum number of delete batches not finished yet
+    :param progress: optional function called with the statistics dictionary after every finished batch
+    :rtype: dict: {"deleted": number of deleted documents, "failed": number of not deleted documents,
+                   "batches": number of delete RPCs, "seconds": elapsed time, "docsPerSecond": throughput}
+    """
+    start_time = time.time()
+    stats = {"deleted": 0, "failed": 0, "batches": 0, "seconds": 0.0, "docsPerSecond": 0.0}
+    pending = deque()
+    failed_ids = []
+
+    def finish_batch():
+        delete_future, doc_ids = pending.popleft()
+        try:
+            delete_results = delete_future.get_result()
+        except search.DeleteError as e:
+            delete_results = e.results
+        deleted_ids = set(doc_id for doc_id, result in zip(doc_ids, delete_results)
+                          if result.code == search.OperationResult.OK)
+        failed_ids.extend(doc_id for doc_id in doc_ids if doc_id not in deleted_ids)
+        stats["deleted"] += len(deleted_ids)
+        stats["batches"] += 1
+        stats["seconds"] = time.time() - start_time
+        if stats["seconds"] > 0:
+            stats["docsPerSecond"] = stats["deleted"] / stats["seconds"]
+        if progress is not None:
+            progress(stats)
+
+    range_future = index_object.get_range_async(ids_only=True, limit=search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST)
+    while range_future is not None:
+        doc_ids = [document.doc_id for document in range_future.get_result()]
+        if len(doc_ids) == 0:
+            # break if there are no more documents
+            break
+        # start_id moves forward so documents still being deleted are not fetched again
+        range_future = index_object.get_range_async(start_id=doc_ids[-1], include_start_object=False,
+                                                    ids_only=True, limit=search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST)
+        while len(pending) >= batches_in_flight:
+            finish_batch()
+        pending.append((index_object.delete_async(doc_ids), doc_ids))
+    while pending:
+        finish_batch()
+    if failed_ids:
+        # failed batches are mostly transient errors, the documents are behind start_id so they are retried here
+        retry_results = delete_documents(index_object, failed_ids)
+        deleted = len([result for result in retry_results if result.code == search.OperationResult.OK])
+        stats["deleted"] += deleted
+        stats["failed"] = len(failed_ids) - deleted
+        stats["batches"] += (len(failed_ids) - 1) // search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST + 1
+    stats["seconds"] = time.time() - start_time
+    if stats["seconds"] > 0:
+        stats["docsPerSecond"] = stats["deleted"] / stats["seconds"]
+    logging.info('Deleted %d documents of index %s in %d batches in %.2f s (%.1f docs/s), %d failed',
+                 stats["deleted"], index_object.name, stats["batches"], stats["seconds"], stats["docsPerSecond"],
+                 stats["failed"])
+    return stats
+
+
+def put_result_to_dict(put_result, id_key):
+    """Returns dictionary with the code and message of search.PutResult under the id_key of the document"""
+    return {
+        id_key: put_result.id,
+        "code": put_result.code,
+        "message": put_result.message
+    }
+
+
+def parse_page_parameters(q):
+    """
+    Reads limit and cursor from parsed query string
+    :param q: dict returned by urlparse.parse_qs
+    :rtype: tuple: (limit, web safe cursor string or None)
+    :raises ValueError: if limit is not an integer in 1..search.MAXIMUM_DOCUMENTS_RETURNED_PER_SEARCH
+    """
+    limit = DEFAULT_PAGE_LIMIT
+    if 'limit' in q.keys():
+        limit = int(q['limit'][0])
+        if limit < 1 or limit > search.MAXIMUM_DOCUMENTS_RETURNED_PER_SEARCH:
+            raise ValueError('limit out of range')
+    web_safe_cursor = None
+    if 'cursor' in q.keys():
+        web_safe_cursor = q['cursor'][0]
+    return limit, web_safe_cursor
+
+
+def parse_stream_parameter(q):
+    """
+    Reads boolean stream parameter from parsed query string
+    :param q: dict returned by urlparse.parse_qs with keep_blank_values=True
+    :rtype: bool: True for bare stream, 1 or true, False for 0 or false or if stream parameter is not given
+    :raises ValueError: if the value is not boolean
+    """
+    if 'stream' not in q.keys():
+        return False
+    value = q['stream'][0].lower()
+    if value in ['', '1', 'true']:
+        return True
+    if value in ['0', 'false']:
+        return False
+    raise ValueError('stream is not boolean')
+
+
+def query_page(index_object, resource_type, query_string='', limit=DEFAULT_PAGE_LIMIT, web_safe_cursor=None,
+               sort_options_object=None, fields=None):
+    """
+    Queries the Full Text Search database for one page of results. It is always one search RPC,
+    also when there is no query_string because empty query matches all documents.
+    :param index_object:
+    :param resource_type: resource_types.ResourceType converting the found documents
+    :param query_string:
+    :param limit: maximum number of documents in the page
+    :param web_safe_cursor: cursor returned with previous page or None for the first page
+    :param sort_options_object:
+    :param fields: list of names of the only fields to return or None for all fields
+    :rtype: tuple: (list of dictionaries of all fields except date field, web safe cursor of the next page or None
+     if this is the last page, number of all documents matching query_string)
+    """
+    returned_fields, ids_only = projection_options(fields, resource_type.id_key)
+    query_options = search.QueryOptions(limit=limit,
+                                        cursor=search.Cursor(web_safe_string=web_safe_cursor),
+                                        sort_options=sort_options_object,
+                                        number_found_accuracy=search.MAXIMUM_NUMBER_FOUND_ACCURACY,
+                                        returned_fields=returned_fields,
+                                        ids_only=ids_only)
+    results = index_object.search(search.Query(query_string=query_string, options=query_options))
+    documents_list = []
+    for found_document in results:
+        documents_list.append(resource_type.document_to_record(found_document, fields))
+    next_cursor = None
+    if results.cursor:
+        next_cursor = results.cursor.web_safe_string
+    return documents_list, next_cursor, results.number_found
+
+
+def add_page_headers(response, total_count, limit, next_cursor):
+    """Fills Total-Count, Total-Pages and Next-Cursor headers of paginated response"""
+    response.headers['Total-Count'] = str(total_count)
+    response.headers['Total-Pages'] = str((total_count + limit - 1) // limit)
+    if next_cursor:
+        response.headers['Next-Cursor'] = str(next_cursor)
+    response.headers.add_header('Access-Control-Expose-Headers', 'Total-Count, Total-Pages, Next-Cursor')
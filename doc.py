@@ -1,8 +1,8 @@
 #!/usr/bin/env python
 
 import webapp2
-from webapp2_extras.routes import RedirectRoute
 
+# webapp2.RedirectHandler does not need webapp2_extras.routes to be imported
 app = webapp2.WSGIApplication([
-    RedirectRoute('/<:.*>', redirect_to='/swaggerui/index.html?url=%2Fswagger.json')
+    webapp2.Route('/<:.*>', webapp2.RedirectHandler, defaults={'_uri': '/swaggerui/index.html?url=%2Fswagger.json'})
 ], debug=False)
@@ -1,11 +1,17 @@
 import webapp2
 import search_dataset
 import search_algorithm
+import search_all
+import metrics
+import warmup
 from common_functions import handle_404
 
 
-application = webapp2.WSGIApplication(
-    [('/algorithms/', search_algorithm.AlgorithmsHandler), ('/algorithms/(.+)', search_algorithm.AlgorithmsIdHandler), ('/datasets/', search_dataset.DatasetsHandler), ('/datasets/(.+)', search_dataset.DatasetsIdHandler)],
+routes_application = webapp2.WSGIApplication(
+    [('/algorithms/', search_algorithm.AlgorithmsHandler), ('/algorithms/(.+)', search_algorithm.AlgorithmsIdHandler), ('/datasets/', search_dataset.DatasetsHandler), ('/datasets/(.+)', search_dataset.DatasetsIdHandler), ('/search/', search_all.SearchHandler), ('/metrics', metrics.MetricsHandler), ('/_ah/warmup', warmup.WarmupHandler)],
     debug=True)
 
-application.error_handlers[404] = handle_404
+routes_application.error_handlers[404] = handle_404
+
+# every request is timed and its search RPCs are counted, see metrics module
+application = metrics.MetricsMiddleware(routes_application)
@@ -0,0 +1,551 @@
+"""In-process search engine with the interface of App Engine search API Index.
+
+Index keeps documents in memory of the instance in a tokenized inverted index with posting lists and a sorted list
+of doc_ids for <index_object>.get_range() scans. It supports put, get, delete, get_range and search with cursors,
+their *_async versions and queries made of words, field:value restrictions, quoted phrases, AND, OR, NOT and
+parentheses. It is meant for running the handlers and benchmarks without App Engine, not for production.
+
+When google.appengine.api.search can be imported its Document, Query, Cursor, result and error classes are used
+so both backends can be mixed with the same code. Otherwise minimal classes with the same names are defined here.
+"""
+
+
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+
+try:
+    from google.appengine.api.search import Error, PutError, DeleteError, QueryError, OperationResult, PutResult, \
+        DeleteResult, Document, ScoredDocument, TextField, HtmlField, AtomField, DateField, NumberField, Cursor, \
+        SortExpression, SortOptions, MatchScorer, RescoringMatchScorer, FieldExpression, QueryOptions, Query, \
+        SearchResults, GetResponse, MAXIMUM_DOCUMENTS_PER_PUT_REQUEST, MAXIMUM_DOCUMENTS_RETURNED_PER_SEARCH, \
+        MAXIMUM_NUMBER_FOUND_ACCURACY, MAXIMUM_DOCUMENT_ID_LENGTH
+except ImportError:
+    MAXIMUM_DOCUMENT_ID_LENGTH = 500
+    MAXIMUM_DOCUMENTS_PER_PUT_REQUEST = 200
+    MAXIMUM_DOCUMENTS_RETURNED_PER_SEARCH = 1000
+    MAXIMUM_NUMBER_FOUND_ACCURACY = 25000
+
+    class Error(Exception):
+        """Base class of errors of this module"""
+
+    class QueryError(Error):
+        """Query string could not be parsed"""
+
+    class PutError(Error):
+        def __init__(self, message, results):
+            super(PutError, self).__init__(message)
+            self.results = results
+
+    class DeleteError(Error):
+        def __init__(self, message, results):
+            super(DeleteError, self).__init__(message)
+            self.results = results
+
+    class OperationResult(object):
+        OK, INVALID_REQUEST, TRANSIENT_ERROR, INTERNAL_ERROR, TIMEOUT, CONCURRENT_TRANSACTION = (
+            'OK', 'INVALID_REQUEST', 'TRANSIENT_ERROR', 'INTERNAL_ERROR', 'TIMEOUT', 'CONCURRENT_TRANSACTION')
+
+        def __init__(self, code, message=None, id=None):
+            self.code = code
+            self.message = message
+            self.id = id
+
+    class PutResult(OperationResult):
+        pass
+
+    class DeleteResult(OperationResult):
+        pass
+
+    class Field(object):
+        def __init__(self, name, value=None, language=None):
+            self.name = name
+            self.value = value
+            self.language = language
+
+    class TextField(Field):
+        pass
+
+    class HtmlField(Field):
+        pass
+
+    class AtomField(Field):
+        pass
+
+    class DateField(Field):
+        pass
+
+    class NumberField(Field):
+        pass
+
+    class Document(object):
+        def __init__(self, doc_id=None, fields=None, language='en', rank=None):
+            self.doc_id = doc_id
+            self.fields = list(fields or [])
+            self.language = language
+            self.rank = rank
+
+        def field(self, field_name):
+            for field in self.fields:
+                if field.name == field_name:
+                    return field
+            raise ValueError('Must have exactly one field with name %s' % field_name)
+
+    class ScoredDocument(Document):
+        def __init__(self, doc_id=None, fields=None, language='en', sort_scores=None, expressions=None, cursor=None,
+                     rank=None):
+            super(ScoredDocument, self).__init__(doc_id, fields, language, rank)
+            self.sort_scores = list(sort_scores or [])
+            self.expressions = list(expressions or [])
+            self.cursor = cursor
+
+    class Cursor(object):
+        def __init__(self, web_safe_string=None, per_result=False):
+            if web_safe_string:
+                parts = web_safe_string.split(':', 1)
+                if len(parts) != 2 or parts[0] not in ['True', 'False']:
+                    raise ValueError('invalid format for web_safe_string, got %s' % web_safe_string)
+            self.web_safe_string = web_safe_string
+            self.per_result = per_result
+
+    class SortExpression(object):
+        ASCENDING, DESCENDING = ('ASCENDING', 'DESCENDING')
+
+        def __init__(self, expression, direction=DESCENDING, default_value=None):
+            self.expression = expression
+            self.direction = direction
+            self.default_value = default_value
+
+    class MatchScorer(object):
+        pass
+
+    class RescoringMatchScorer(MatchScorer):
+        pass
+
+    class FieldExpression(object):
+        def __init__(self, name, expression):
+            self.name = name
+            self.expression = expression
+
+    class SortOptions(object):
+        def __init__(self, expressions=None, match_scorer=None, limit=1000):
+            self.expressions = list(expressions or [])
+            self.match_scorer = match_scorer
+            self.limit = limit
+
+    class QueryOptions(object):
+        def __init__(self, limit=20, number_found_accuracy=None, cursor=None, offset=None, sort_options=None,
+                     returned_fields=None, ids_only=False, snippeted_fields=None, returned_expressions=None):
+            if ids_only and returned_fields:
+                raise ValueError('cannot have ids_only and returned_fields set together')
+            self.limit = limit
+            self.number_found_accuracy = number_found_accuracy
+            self.cursor = cursor
+            self.offset = offset
+            self.sort_options = sort_options
+            self.returned_fields = list(returned_fields or [])
+            self.ids_only = ids_only
+            self.returned_expressions = list(returned_expressions or [])
+
+    class Query(object):
+        def __init__(self, query_string, options=None):
+            # malformed query string raises QueryError when the query is built like in the search API
+            _QueryParser(query_string).parse()
+            self.query_string = query_string
+            self.options = options
+
+    class SearchResults(object):
+        def __init__(self, number_found, results=None, cursor=None, facets=None):
+            self.number_found = number_found
+            self.results = list(results or [])
+            self.cursor = cursor
+
+        def __iter__(self):
+            return iter(self.results)
+
+    class GetResponse(object):
+        def __init__(self, results=None):
+            self.results = list(results or [])
+
+        def __iter__(self):
+            return iter(self.results)
+
+        def __len__(self):
+            return len(self.results)
+
+        def __getitem__(self, index):
+            return self.results[index]
+
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_TAG_RE = re.compile(r'<[^>]*>')
+_QUERY_TOKEN_RE = re.compile(r'\(|\)|"[^"]*"|[^\s()"]+')
+_OPERATORS = ['AND', 'OR', 'NOT']
+# field types which are not tokenized for full text queries
+_UNSEARCHABLE_FIELDS = ['DateField', 'NumberField', 'GeoField']
+
+
+def tokenize(value):
+    """Splits text into lowercase words the same way for documents and queries"""
+    return [token.lower() for token in _TOKEN_RE.findall(value)]
+
+
+def field_tokens(field):
+    """Returns list of tokens of a search field according to its type"""
+    field_type = field.__class__.__name__
+    if field_type in _UNSEARCHABLE_FIELDS or field.value is None:
+        return []
+    if field_type == 'AtomField':
+        return [field.value.lower()]
+    if field_type == 'HtmlField':
+        return tokenize(_TAG_RE.sub(' ', field.value))
+    return tokenize(field.value)
+
+
+_rpc_latency = 0.0
+
+
+def set_rpc_latency(seconds):
+    """
+    Sets simulated round trip time of every call. get_result() of a call returns no sooner than seconds after
+    the call was made, so benchmarks show how much of the latency is hidden by overlapping *_async calls.
+    """
+    global _rpc_latency
+    _rpc_latency = seconds
+
+
+class _Future(object):
+    """Result of *_async call. The operation is done when the call is made, the result is ready after latency."""
+
+    def __init__(self, function, *args, **kwargs):
+        self._ready_time = time.time() + _rpc_latency
+        try:
+            self._result = function(*args, **kwargs)
+            self._exception = None
+        except Exception as e:
+            self._result = None
+            self._exception = e
+
+    def get_result(self):
+        remaining = self._ready_time - time.time()
+        if remaining > 0:
+            time.sleep(remaining)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+
+class _IndexData(object):
+    """Documents and posting lists of one index shared by all Index objects with the same name"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.documents = {}  # doc_id -> search.Document
+        self.ranks = {}  # doc_id -> rank, the newest document has the highest rank
+        self.sorted_ids = []  # doc_ids in ascending order for range scans
+        self.postings = {}  # token -> {doc_id: term frequency}
+        self.field_postings = {}  # (field name, token) -> {doc_id: term frequency}
+        self.next_rank = 0
+
+    def add(self, document):
+        if document.doc_id in self.documents:
+            self.remove(document.doc_id)
+        else:
+            insort(self.sorted_ids, document.doc_id)
+        self.documents[document.doc_id] = document
+        self.next_rank += 1
+        self.ranks[document.doc_id] = self.next_rank
+        for field in document.fields:
+            for token in field_tokens(field):
+                frequencies = self.postings.setdefault(token, {})
+                frequencies[document.doc_id] = frequencies.get(document.doc_id, 0) + 1
+                frequencies = self.field_postings.setdefault((field.name, token), {})
+                frequencies[document.doc_id] = frequencies.get(document.doc_id, 0) + 1
+
+    def remove(self, doc_id, keep_sorted_id=True):
+        document = self.documents.pop(doc_id)
+        del self.ranks[doc_id]
+        for field in document.fields:
+            for token in field_tokens(field):
+                for postings, key in [(self.postings, token), (self.field_postings, (field.name, token))]:
+                    frequencies = postings.get(key)
+                    if frequencies is not None:
+                        frequencies.pop(doc_id, None)
+                        if not frequencies:
+                            del postings[key]
+        if not keep_sorted_id:
+            del self.sorted_ids[bisect_left(self.sorted_ids, doc_id)]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _get_index_data(name):
+    with _indexes_lock:
+        if name not in _indexes:
+            _indexes[name] = _IndexData()
+        return _indexes[name]
+
+
+def clear_all():
+    """Removes all in-memory indexes e.g. between tests"""
+    with _indexes_lock:
+        _indexes.clear()
+
+
+class _QueryParser(object):
+    """
+    Recursive descent parser of query strings. Precedence is the same as in App Engine search API:
+    NOT binds stronger than OR, which binds stronger than AND (explicit or implicit between terms).
+    Parsed query is a tree of tuples: ('and', [nodes]), ('or', [nodes]), ('not', node), ('term', field or None, tokens)
+    """
+
+    def __init__(self, query_string):
+        self._tokens = _QUERY_TOKEN_RE.findall(query_string)
+        self._position = 0
+
+    def parse(self):
+        if not self._tokens:
+            return None
+        node = self._parse_and()
+        if self._position != len(self._tokens):
+            raise QueryError('Failed to parse query at "%s"' % self._tokens[self._position])
+        return node
+
+    def _peek(self):
+        if self._position < len(self._tokens):
+            return self._tokens[self._position]
+        return None
+
+    def _parse_and(self):
+        nodes = [self._parse_or()]
+        while self._peek() is not None and self._peek() != ')':
+            if self._peek() == 'AND':
+                self._position += 1
+            nodes.append(self._parse_or())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def _parse_or(self):
+        nodes = [self._parse_not()]
+        while self._peek() == 'OR':
+            self._position += 1
+            nodes.append(self._parse_not())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def _parse_not(self):
+        token = self._peek()
+        if token == 'NOT':
+            self._position += 1
+            return 'not', self._parse_not()
+        if token is not None and token.startswith('-') and len(token) > 1:
+            self._tokens[self._position] = token[1:]
+            return 'not', self._parse_not()
+        return self._parse_term()
+
+    def _parse_term(self):
+        token = self._peek()
+        if token is None or token == ')' or token in _OPERATORS:
+            raise QueryError('Failed to parse query at "%s"' % token)
+        self._position += 1
+        if token == '(':
+            node = self._parse_and()
+            if self._peek() != ')':
+                raise QueryError('Missing ")" in query')
+            self._position += 1
+            return node
+        field_name = None
+        match = re.match(r'^(\w+)[:=](.+)$', token, re.UNICODE)
+        if match:
+            field_name, token = match.groups()
+        if token.startswith('"'):
+            token = token.strip('"')
+        tokens = tokenize(token)
+        if not tokens:
+            raise QueryError('Failed to parse query at "%s"' % token)
+        return 'term', field_name, tokens
+
+
+class Index(object):
+    """
+    In-memory equivalent of google.appengine.api.search.Index.
+    All Index objects with the same name share the same documents like handles of the search service do.
+    """
+
+    def __init__(self, name, namespace=None):
+        self.name = name
+        self.namespace = namespace
+        self._data = _get_index_data(name)
+
+    def put(self, documents, deadline=None):
+        """Indexes document or list of documents. Document with the same doc_id is replaced."""
+        return self.put_async(documents).get_result()
+
+    def _put(self, documents):
+        if isinstance(documents, Document) or hasattr(documents, 'fields'):
+            documents = [documents]
+        documents = list(documents)
+        if len(documents) > MAXIMUM_DOCUMENTS_PER_PUT_REQUEST:
+            raise ValueError('too many documents to index')
+        results = []
+        with self._data.lock:
+            for document in documents:
+                self._data.add(document)
+                results.append(PutResult(code=OperationResult.OK, id=document.doc_id))
+        return results
+
+    def delete(self, document_ids, deadline=None):
+        """Deletes documents with given doc_id or list of doc_ids. Nonexistent doc_ids are ignored."""
+        return self.delete_async(document_ids).get_result()
+
+    def _delete(self, document_ids):
+        if isinstance(document_ids, basestring):
+            document_ids = [document_ids]
+        document_ids = list(document_ids)
+        if len(document_ids) > MAXIMUM_DOCUMENTS_PER_PUT_REQUEST:
+            raise ValueError('too many documents to delete')
+        results = []
+        with self._data.lock:
+            for doc_id in document_ids:
+                if doc_id in self._data.documents:
+                    self._data.remove(doc_id, keep_sorted_id=False)
+                results.append(DeleteResult(code=OperationResult.OK, id=doc_id))
+        return results
+
+    def get(self, doc_id, deadline=None):
+        """Returns document with given doc_id or None"""
+        return self.get_async(doc_id).get_result()
+
+    def _get(self, doc_id):
+        with self._data.lock:
+            return self._data.documents.get(doc_id)
+
+    def get_range(self, start_id=None, include_start_object=True, limit=100, ids_only=False, deadline=None):
+        """Returns GetResponse with up to limit documents in ascending doc_id order starting from start_id"""
+        return self.get_range_async(start_id, include_start_object, limit, ids_only).get_result()
+
+    def _get_range(self, start_id=None, include_start_object=True, limit=100, ids_only=False):
+        with self._data.lock:
+            sorted_ids = self._data.sorted_ids
+            if start_id is None:
+                position = 0
+            elif include_start_object:
+                position = bisect_left(sorted_ids, start_id)
+            else:
+                position = bisect_right(sorted_ids, start_id)
+            results = []
+            for doc_id in sorted_ids[position:position + limit]:
+                if ids_only:
+                    results.append(Document(doc_id=doc_id))
+                else:
+                    results.append(self._data.documents[doc_id])
+        return GetResponse(results=results)
+
+    def search(self, query, deadline=None, **kwargs):
+        """Returns SearchResults of search.Query or query string. Cursors are offsets into the matching documents."""
+        return self.search_async(query).get_result()
+
+    def _search(self, query):
+        if isinstance(query, basestring):
+            query = Query(query_string=query)
+        options = query.options or QueryOptions()
+        tree = _QueryParser(query.query_string).parse()
+        with self._data.lock:
+            if tree is None:
+                matches = dict.fromkeys(self._data.documents, 0)
+            else:
+                matches = self._evaluate(tree)
+            ordered_ids = self._sort(matches, options.sort_options)
+            offset = options.offset or 0
+            if options.cursor is not None and options.cursor.web_safe_string:
+                try:
+                    offset = int(options.cursor.web_safe_string.split(':', 1)[1])
+                except ValueError:
+                    raise ValueError('invalid format for web_safe_string, got %s' % options.cursor.web_safe_string)
+            page_ids = ordered_ids[offset:offset + options.limit]
+            results = []
+            for doc_id in page_ids:
+                document = self._data.documents[doc_id]
+                fields = document.fields
+                if options.ids_only:
+                    fields = []
+                elif options.returned_fields:
+                    fields = [field for field in fields if field.name in options.returned_fields]
+                sort_scores = None
+                if options.sort_options is not None and options.sort_options.match_scorer is not None:
+                    sort_scores = [float(matches[doc_id])]
+                # only _score expression is evaluated
+                expressions = [NumberField(name=expression.name, value=float(matches[doc_id]))
+                               for expression in options.returned_expressions or [] if expression.expression == '_score']
+                results.append(ScoredDocument(doc_id=doc_id, fields=fields, sort_scores=sort_scores,
+                                              expressions=expressions, rank=self._data.ranks[doc_id]))
+        cursor = None
+        if options.cursor is not None and offset + options.limit < len(ordered_ids):
+            cursor = Cursor(web_safe_string='False:%d' % (offset + options.limit))
+        return SearchResults(number_found=len(ordered_ids), results=results, cursor=cursor)
+
+    def put_async(self, documents, deadline=None):
+        return _Future(self._put, documents)
+
+    def delete_async(self, document_ids, deadline=None):
+        return _Future(self._delete, document_ids)
+
+    def get_async(self, doc_id, deadline=None):
+        return _Future(self._get, doc_id)
+
+    def get_range_async(self, start_id=None, include_start_object=True, limit=100, ids_only=False, deadline=None):
+        return _Future(self._get_range, start_id, include_start_object, limit, ids_only)
+
+    def search_async(self, query, deadline=None, **kwargs):
+        return _Future(self._search, query)
+
+    def _evaluate(self, node):
+        """Returns {doc_id: score} of documents matching parsed query node. Score is sum of term frequencies."""
+        if node[0] == 'term':
+            field_name, tokens = node[1], node[2]
+            matches = None
+            for token in tokens:
+                if field_name is None:
+                    frequencies = self._data.postings.get(token, {})
+                else:
+                    frequencies = self._data.field_postings.get((field_name, token), {})
+                if matches is None:
+                    matches = dict(frequencies)
+                else:
+                    matches = dict((doc_id, score + frequencies[doc_id]) for doc_id, score in matches.items()
+                                   if doc_id in frequencies)
+            return matches
+        if node[0] == 'not':
+            excluded = self._evaluate(node[1])
+            return dict((doc_id, 0) for doc_id in self._data.documents if doc_id not in excluded)
+        if node[0] == 'or':
+            matches = {}
+            for child in node[1]:
+                for doc_id, score in self._evaluate(child).items():
+                    matches[doc_id] = matches.get(doc_id, 0) + score
+            return matches
+        # 'and' evaluates children with the shortest posting lists first
+        children = sorted([self._evaluate(child) for child in node[1]], key=len)
+        matches = children[0]
+        for child in children[1:]:
+            matches = dict((doc_id, score + child[doc_id]) for doc_id, score in matches.items() if doc_id in child)
+        return matches
+
+    def _sort(self, matches, sort_options):
+        """Returns doc_ids of matches in order of sort_options, by default the newest documents first"""
+        ranks = self._data.ranks
+        ordered_ids = sorted(matches, key=lambda doc_id: -ranks[doc_id])
+        if sort_options is None:
+            return ordered_ids
+        if sort_options.match_scorer is not None:
+            ordered_ids.sort(key=lambda doc_id: -matches[doc_id])
+        # stable sorts from the least significant expression
+        for expression in reversed(sort_options.expressions):
+            def sort_key(doc_id):
+                for field in self._data.documents[doc_id].fields:
+                    if field.name == expression.expression:
+                        return field.value
+                return expression.default_value
+            ordered_ids.sort(key=sort_key, reverse=expression.direction == SortExpression.DESCENDING)
+        return ordered_ids
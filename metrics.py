@@ -0,0 +1,294 @@
+"""Timing and search RPC instrumentation of requests exposed in Prometheus text format at /metrics.
+
+MetricsMiddleware wraps the WSGI application and for sampled requests records per route latency, response bytes and
+the number and duration of search index calls made during the request. Index objects returned by
+search_backend.get_index() are wrapped by InstrumentedIndex only while a sampled request is recorded,
+so with sample rate 0 the only overhead is one check of the rate per request and one per get_index().
+The sample rate is read from METRICS_SAMPLE_RATE environment variable (default 1.0) or set by set_sample_rate().
+Metrics are kept in memory of the instance, so every instance reports only requests it served.
+/metrics is restricted to administrators of the application by its handler in app.yaml.
+"""
+
+
+import os
+import random
+import threading
+import time
+
+import webapp2
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+CALLS_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100, 200]
+BYTES_BUCKETS = [100, 1000, 10000, 100000, 1000000, 10000000]
+# methods of search index counted as RPCs, *_async versions are counted until get_result() returns
+_INDEX_CALLS = ['put', 'delete', 'get', 'get_range', 'search']
+
+_sample_rate = float(os.getenv('METRICS_SAMPLE_RATE', '1.0'))
+_local = threading.local()
+
+
+def set_sample_rate(rate):
+    """Sets fraction of requests which are recorded, 0 turns recording off"""
+    global _sample_rate
+    _sample_rate = rate
+
+
+def get_sample_rate():
+    return _sample_rate
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(label_names, label_values, extra=''):
+    pairs = ['%s="%s"' % (name, _escape(value)) for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class Counter(object):
+    """Monotonic counter with labels"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def lines(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = ['# HELP %s %s' % (self.name, self.help_text), '# TYPE %s counter' % self.name]
+        for label_values, value in values:
+            lines.append('%s%s %s' % (self.name, _format_labels(self.label_names, label_values),
+                                      _format_number(value)))
+        return lines
+
+
+class Histogram(object):
+    """Histogram with cumulative buckets, sum and count for every combination of label values"""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._values = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = [0] * len(self.buckets) + [0, 0]
+                self._values[label_values] = entry
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[position] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def lines(self):
+        with self._lock:
+            values = sorted((label_values, list(entry)) for label_values, entry in self._values.items())
+        lines = ['# HELP %s %s' % (self.name, self.help_text), '# TYPE %s histogram' % self.name]
+        for label_values, entry in values:
+            for bound, bucket_count in zip(self.buckets, entry):
+                lines.append('%s_bucket%s %d' % (self.name, _format_labels(self.label_names, label_values,
+                                                                          'le="%s"' % bound), bucket_count))
+            lines.append('%s_bucket%s %d' % (self.name, _format_labels(self.label_names, label_values, 'le="+Inf"'),
+                                             entry[-1]))
+            lines.append('%s_sum%s %s' % (self.name, _format_labels(self.label_names, label_values),
+                                          _format_number(entry[-2])))
+            lines.append('%s_count%s %d' % (self.name, _format_labels(self.label_names, label_values), entry[-1]))
+        return lines
+
+
+requests_total = Counter('http_requests_total', 'Number of recorded requests.', ['route', 'method', 'status'])
+request_duration = Histogram('http_request_duration_seconds', 'Time from the call of the application until'
+                             ' the last byte of the response body.', ['route', 'method'], LATENCY_BUCKETS)
+response_bytes = Histogram('http_response_bytes', 'Size of the response body.', ['route', 'method'], BYTES_BUCKETS)
+request_rpc_calls = Histogram('search_rpc_calls_per_request', 'Number of search index calls made by one request.',
+                              ['route', 'method'], CALLS_BUCKETS)
+request_rpc_duration = Histogram('search_rpc_duration_seconds_per_request', 'Sum of durations of search index'
+                                 ' calls made by one request.', ['route', 'method'], LATENCY_BUCKETS)
+rpc_duration = Histogram('search_rpc_duration_seconds', 'Duration of search index calls.', ['index', 'call'],
+                         LATENCY_BUCKETS)
+_METRICS = [requests_total, request_duration, response_bytes, request_rpc_calls, request_rpc_duration, rpc_duration]
+
+
+def reset_metrics():
+    """Removes all recorded values e.g. between tests"""
+    for metric in _METRICS:
+        with metric._lock:
+            metric._values.clear()
+
+
+def render_metrics():
+    """Returns all metrics in Prometheus text exposition format"""
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.lines())
+    return '\n'.join(lines) + '\n'
+
+
+class _RequestRecord(object):
+    """Measurements of one sampled request"""
+
+    def __init__(self, route, method):
+        self.route = route
+        self.method = method
+        self.status = ''
+        self.start_time = time.time()
+        self.response_bytes = 0
+        self.rpc_calls = 0
+        self.rpc_seconds = 0.0
+        self.finished = False
+
+    def add_rpc(self, index_name, call, seconds):
+        self.rpc_calls += 1
+        self.rpc_seconds += seconds
+        rpc_duration.observe((index_name, call), seconds)
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        labels = (self.route, self.method)
+        requests_total.inc((self.route, self.method, self.status))
+        request_duration.observe(labels, time.time() - self.start_time)
+        response_bytes.observe(labels, self.response_bytes)
+        request_rpc_calls.observe(labels, self.rpc_calls)
+        request_rpc_duration.observe(labels, self.rpc_seconds)
+
+
+class _TimedFuture(object):
+    """Future of *_async index call recording its duration when the result is retrieved the first time"""
+
+    def __init__(self, future, record, index_name, call, start_time):
+        self._future = future
+        self._record = record
+        self._index_name = index_name
+        self._call = call
+        self._start_time = start_time
+
+    def get_result(self):
+        try:
+            return self._future.get_result()
+        finally:
+            if self._record is not None:
+                self._record.add_rpc(self._index_name, self._call, time.time() - self._start_time)
+                self._record = None
+
+
+class InstrumentedIndex(object):
+    """Proxy of search index object recording every call in the request record"""
+
+    def __init__(self, index_object, record):
+        self._index = index_object
+        self._record = record
+
+    def __getattr__(self, name):
+        attribute = getattr(self._index, name)
+        if name in _INDEX_CALLS:
+            def timed_call(*args, **kwargs):
+                start_time = time.time()
+                try:
+                    return attribute(*args, **kwargs)
+                finally:
+                    self._record.add_rpc(self._index.name, name, time.time() - start_time)
+            return timed_call
+        if name.endswith('_async') and name[:-len('_async')] in _INDEX_CALLS:
+            def timed_async_call(*args, **kwargs):
+                start_time = time.time()
+                return _TimedFuture(attribute(*args, **kwargs), self._record, self._index.name,
+                                    name[:-len('_async')], start_time)
+            return timed_async_call
+        return attribute
+
+
+def instrument_index(index_object):
+    """Returns index_object wrapped by InstrumentedIndex if the current request is recorded"""
+    record = getattr(_local, 'record', None)
+    if record is None:
+        return index_object
+    return InstrumentedIndex(index_object, record)
+
+
+class _RecordingIterable(object):
+    """Response body counting bytes and finishing the record when the server closes it"""
+
+    def __init__(self, app_iter, record):
+        self._app_iter = app_iter
+        self._record = record
+
+    def __iter__(self):
+        for chunk in self._app_iter:
+            self._record.response_bytes += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self._app_iter, 'close'):
+                self._app_iter.close()
+        finally:
+            self._record.finish()
+            if getattr(_local, 'record', None) is self._record:
+                _local.record = None
+
+
+class MetricsMiddleware(object):
+    """WSGI middleware recording sampled requests of webapp2 application labelled by the template of the route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def route_label(self, environ):
+        try:
+            route = self.app.router.match(webapp2.Request(environ))[0]
+        except Exception:
+            return 'unmatched'
+        # webapp2 adds anchors to the template of simple route when it is compiled
+        return route.template.lstrip('^').rstrip('$')
+
+    def __call__(self, environ, start_response):
+        if _sample_rate <= 0 or (_sample_rate < 1 and random.random() >= _sample_rate):
+            return self.app(environ, start_response)
+        record = _RequestRecord(self.route_label(environ), environ.get('REQUEST_METHOD', ''))
+
+        def recording_start_response(status, response_headers, exc_info=None):
+            record.status = status.split(' ', 1)[0]
+            return start_response(status, response_headers, exc_info)
+
+        # the record stays current until the body is written, streamed bodies call the index while iterated
+        _local.record = record
+        try:
+            app_iter = self.app(environ, recording_start_response)
+        except Exception:
+            _local.record = None
+            record.finish()
+            raise
+        return _RecordingIterable(app_iter, record)
+
+
+class MetricsHandler(webapp2.RequestHandler):
+    def get(self):
+        """GET metrics of this instance in Prometheus text format"""
+        self.response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+        self.response.status = 200
+        self.response.out.write(render_metrics())
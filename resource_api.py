@@ -0,0 +1,416 @@
+"""Queries, caches and request handlers of collections of resources of one resource type.
+
+All of them are generic and take the resource type from the collection they are bound to, so a resource type
+module only declares its type and its collection and binds the handlers used by the routes:
+    ALGORITHMS = ResourceCollection(ALGORITHM)
+
+    class AlgorithmsHandler(CollectionHandler):
+        collection = ALGORITHMS
+"""
+
+
+from urlparse import urlparse, parse_qs
+
+import webapp2
+import json
+from search_backend import search, get_index
+from common_functions import add_cors_headers, write_error, parse_page_parameters, \
+    query_page, add_page_headers, DEFAULT_PAGE_LIMIT, GET_PARAMETERS, iter_document_pages, \
+    put_result_to_dict, get_documents, parse_ids_parameter, normalize_query_string, \
+    sort_options_key, make_etag, write_json, delete_documents, parse_stream_parameter, \
+    delete_all_documents, parse_fields_parameter, projection_options, write_json_stream, \
+    negotiate_format, encode_records, iter_records, FORMAT_JSON, FORMAT_NDJSON, \
+    iter_json_document_pages, upsert_documents, add_upsert_headers, UPSERT_UNCHANGED
+from cache import LRUCache, get_write_generation, bump_write_generation
+
+_CACHE_SIZE = 1000
+_CACHE_TTL = 60  # seconds
+_QUERY_CACHE_BYTES = 8 * 1024 * 1024
+
+
+class ResourceCollection(object):
+    """Collection of one resource type stored in its search index with per instance caches"""
+
+    def __init__(self, resource_type):
+        """
+        :param resource_type: resource_types.ResourceType
+        """
+        self.resource_type = resource_type
+        self.index_string = resource_type.index_string
+        # name used in error messages e.g. Algorithm Not Found
+        self.title = resource_type.name[0].upper() + resource_type.name[1:]
+        # per instance cache of get() results invalidated by POST and DELETE handlers
+        self.cache = LRUCache(max_size=_CACHE_SIZE, ttl=_CACHE_TTL)
+        # per instance cache of serialized query() results keyed by the write generation of the index
+        self.query_cache = LRUCache(max_size=None, ttl=_CACHE_TTL, max_bytes=_QUERY_CACHE_BYTES)
+
+    def delete_all(self, index_object, progress=None):
+        """
+        Deletes all resources to clear database. No use case. Just to start over for debugging and reiterating while
+        testing. Fetching of next page of ids overlaps with several batch deletes in flight, see delete_all_documents()
+        :param index_object:
+        :param progress: optional function called with the statistics dictionary after every finished batch
+        :rtype: dict: statistics of deleting with deleted, failed, batches, seconds and docsPerSecond keys
+        """
+        return delete_all_documents(index_object, progress=progress)
+
+    def query(self, index_object, query_string='', sort_options_object=None, fields=None):
+        """
+        Queries the Full Text Search database and returns all results
+        :param index_object:
+        :param query_string:
+        :param sort_options_object:
+        :param fields: list of names of the only fields to return or None for all fields
+        :rtype: list: list of dictionaries of all fields except date field in all found documents.
+        """
+        records = []
+        returned_fields, ids_only = projection_options(fields, self.resource_type.id_key)
+        for page in iter_document_pages(index_object, query_string, sort_options_object,
+                                        returned_fields=returned_fields, ids_only=ids_only):
+            for found_document in page:
+                records.append(self.resource_type.document_to_record(found_document, fields))
+        return records
+
+    def query_json(self, index_object, query_string='', sort_options_object=None, fields=None):
+        """
+        Returns query() result serialized to JSON together with its ETag. It is cached until the next write
+        to the index made by this instance or _CACHE_TTL seconds for writes made by other instances, so conditional
+        GET of unchanged result does not read the index.
+        :param index_object:
+        :param query_string:
+        :param sort_options_object:
+        :param fields: list of names of the only fields to return or None for all fields
+        :rtype: tuple: (str: JSON array, str: ETag)
+        """
+        key = (get_write_generation(self.index_string), normalize_query_string(query_string),
+               sort_options_key(sort_options_object), fields and tuple(fields))
+        cached = self.query_cache.get(key)
+        if cached is None:
+            records_json = ''.join(self.iter_records(index_object, query_string, sort_options_object, fields))
+            cached = (records_json, make_etag(records_json))
+            self.query_cache.set(key, cached, size=len(records_json))
+        return cached
+
+    def iter_records(self, index_object, query_string='', sort_options_object=None, fields=None,
+                     body_format=FORMAT_JSON):
+        """
+        Queries the Full Text Search database and yields all results encoded in body_format chunk by chunk
+        :param index_object:
+        :param query_string:
+        :param sort_options_object:
+        :param fields: list of names of the only fields to return or None for all fields
+        :param body_format: FORMAT_JSON or FORMAT_NDJSON
+        :rtype: generator: str chunks of the same dictionaries as returned by query()
+        """
+        if fields is None:
+            # JSON stored at index time is spliced into the body
+            document_pages = iter_json_document_pages(index_object, query_string, sort_options_object)
+        else:
+            returned_fields, ids_only = projection_options(fields, self.resource_type.id_key)
+            document_pages = iter_document_pages(index_object, query_string, sort_options_object,
+                                                 returned_fields=returned_fields, ids_only=ids_only)
+        return iter_records(document_pages, self.resource_type, body_format, fields)
+
+    def query_page(self, index_object, query_string='', limit=DEFAULT_PAGE_LIMIT, web_safe_cursor=None,
+                   sort_options_object=None, fields=None):
+        """
+        Queries the Full Text Search database and returns one page of results
+        :param index_object:
+        :param query_string:
+        :param limit: maximum number of resources in the page
+        :param web_safe_cursor: cursor returned with previous page or None for the first page
+        :param sort_options_object:
+        :param fields: list of names of the only fields to return or None for all fields
+        :rtype: tuple: (list of dictionaries of all fields except date field, next page cursor or None, number found)
+        """
+        return query_page(index_object, self.resource_type, query_string, limit, web_safe_cursor,
+                          sort_options_object, fields)
+
+    def get(self, index_object, doc_id):
+        """
+        Queries the Full Text Search database and returns one document where id=doc_id
+        :param index_object:
+        :param doc_id:
+        :rtype : dict or 1 if not found
+        """
+        found_document = index_object.get(doc_id)
+        if found_document is None:
+            return 1
+        return self.resource_type.document_to_record(found_document)
+
+    def get_cached(self, index_object, doc_id):
+        """
+        Returns get() result from the cache or queries the Full Text Search database and caches it
+        :param index_object:
+        :param doc_id:
+        :rtype : dict or 1 if not found
+        """
+        record = self.cache.get(doc_id)
+        if record is None:
+            generation = self.cache.generation()
+            record = self.get(index_object, doc_id)
+            if record != 1:
+                self.cache.set(doc_id, record, generation)
+        return record
+
+    def get_many(self, index_object, doc_ids, fields=None):
+        """
+        Queries the Full Text Search database concurrently for all documents where id is in doc_ids
+        :param index_object:
+        :param doc_ids: list of ids
+        :param fields: list of names of the only fields to return or None for all fields
+        :rtype: tuple: (list of dictionaries of found resources, list of ids not found) both in the order of doc_ids
+        """
+        found_list = []
+        missing_ids = []
+        for doc_id, found_document in zip(doc_ids, get_documents(index_object, doc_ids)):
+            if found_document is None:
+                missing_ids.append(doc_id)
+            else:
+                found_list.append(self.resource_type.document_to_record(found_document, fields))
+        return found_list, missing_ids
+
+    def delete(self, index_object, doc_id):
+        """
+        Deletes a resource with one delete RPC
+        :param index_object:
+        :param doc_id:
+        :rtype : int: 0 if deleted or it was not there, 1 if not deleted
+        """
+        return self.delete_many(index_object, [doc_id])[0]
+
+    def delete_many(self, index_object, doc_ids):
+        """
+        Deletes resources with one delete RPC per 200 ids
+        :param index_object:
+        :param doc_ids: list of ids
+        :rtype : list: 0 if deleted or it was not there, 1 if not deleted for every id in the same order
+        """
+        results = []
+        for delete_result in delete_documents(index_object, doc_ids):
+            if delete_result.code == search.OperationResult.OK:
+                results.append(0)
+            else:
+                results.append(1)
+        return results
+
+    def put_many(self, index_object, records):
+        """
+        Validates and indexes list of dictionaries in batches, resources equal to the indexed ones are not indexed again
+        :param index_object:
+        :param records: list of dictionaries like the one accepted by <resource_type>.is_record()
+        :rtype: list: dictionaries with the id, code and message of search.PutResult and status created, updated or
+         unchanged for every record in the same order as records. Malformed records are not indexed and have code
+         INVALID_REQUEST.
+        """
+        id_key = self.resource_type.id_key
+        results = [None] * len(records)
+        documents = []
+        positions = []
+        for position, data in enumerate(records):
+            document = None
+            if self.resource_type.is_record(data):
+                try:
+                    document = self.resource_type.create_document(data)
+                except ValueError:
+                    # value refused by search.Document e.g. field over the size limit
+                    pass
+            if document is not None:
+                documents.append(document)
+                positions.append(position)
+            else:
+                doc_id = None
+                if isinstance(data, dict):
+                    doc_id = data.get(id_key)
+                results[position] = {
+                    id_key: doc_id,
+                    "code": search.OperationResult.INVALID_REQUEST,
+                    "message": "Malformed Data"
+                }
+        for position, (put_result, status) in zip(positions, upsert_documents(index_object, documents)):
+            results[position] = put_result_to_dict(put_result, id_key)
+            results[position]['status'] = status
+        return results
+
+
+class ItemHandler(webapp2.RequestHandler):
+    """Requests of one resource of the collection set by subclasses"""
+
+    collection = None
+
+    def get(self, doc_id):
+        """GET one resource. With fields parameter only the comma separated fields are returned."""
+        try:
+            fields = parse_fields_parameter(parse_qs(urlparse(self.request.uri).query),
+                                            self.collection.resource_type.field_names)
+        except ValueError:
+            write_error(self.response, 400, 'Malformed Data')
+            return
+        if self.collection.resource_type.is_id(doc_id):
+            record = self.collection.get_cached(get_index(self.collection.index_string), doc_id)
+            if record != 1:
+                if fields is not None:
+                    # the whole resource is cached so the projection is made here
+                    record = dict((key, value) for key, value in record.items() if key in fields)
+                write_json(self.request, self.response, json.dumps(record))
+            else:
+                write_error(self.response, 404, self.collection.title + ' Not Found')
+        else:
+            write_error(self.response, 400, 'Malformed Data')
+
+    def delete(self, doc_id):
+        if self.collection.resource_type.is_id(doc_id):
+            result = self.collection.delete(get_index(self.collection.index_string), doc_id)
+            self.collection.cache.invalidate(doc_id)
+            bump_write_generation(self.collection.index_string)
+            if result != 1:
+                # delete is successful even if the doc_id was not there
+                add_cors_headers(self.response)
+                self.response.headers['Content-Type'] = 'application/json; charset=utf-8'
+                self.response.status = 200
+            else:
+                write_error(self.response, 500, self.collection.title + ' Not Deleted')
+        else:
+            write_error(self.response, 400, 'Malformed Data')
+
+
+class CollectionHandler(webapp2.RequestHandler):
+    """Requests of the whole collection set by subclasses"""
+
+    collection = None
+
+    def get(self):
+        """GET resources from Full Text Search
+        Whole collection is returned unless limit or cursor parameter is given, then only one page is returned
+        with Total-Count, Total-Pages and Next-Cursor headers. With stream parameter (bare, 1 or true) the
+        whole collection is encoded page after page without building the list in memory. The python27 runtime
+        buffers the whole response before sending it, so streaming saves memory of the instance but the client
+        does not get the first page sooner. With ids parameter only resources with given
+        comma separated ids are returned together with the list of missing ids. With fields parameter only
+        the comma separated fields are read from the index and returned.
+        Lists are JSON unless Accept header prefers NDJSON (application/x-ndjson, one resource per line), which is
+        always streamed. NDJSON of ids request has one found resource per line and missing ids in Missing-Ids
+        header.
+        """
+        collection = self.collection
+        index_object = get_index(collection.index_string)
+        url = urlparse(self.request.uri)
+        # blank values are kept so that bare ?stream is a parameter
+        q = parse_qs(url.query, keep_blank_values=True)
+        if url.query and not [key for key in q.keys() if key in GET_PARAMETERS]:
+            write_error(self.response, 400, 'Malformed Data')
+            return
+        try:
+            fields = parse_fields_parameter(q, collection.resource_type.field_names)
+            stream = parse_stream_parameter(q)
+        except ValueError:
+            write_error(self.response, 400, 'Malformed Data')
+            return
+        body_format = negotiate_format(self.request)
+        if 'ids' in q.keys():
+            try:
+                doc_ids = parse_ids_parameter(q, collection.resource_type.is_id)
+            except ValueError:
+                write_error(self.response, 400, 'Malformed Data')
+                return
+            found_list, missing_ids = collection.get_many(index_object, doc_ids, fields)
+            if body_format == FORMAT_NDJSON:
+                # every line is a resource like in the listing
+                self.response.headers['Missing-Ids'] = ','.join(missing_ids)
+                self.response.headers.add_header('Access-Control-Expose-Headers', 'Missing-Ids')
+                body = encode_records(found_list, body_format)
+            else:
+                body = json.dumps({"found": found_list, "missing": missing_ids})
+            write_json(self.request, self.response, body, body_format=body_format)
+            return
+        query_string = ''
+        if 'query' in q.keys():
+            query_string = q['query'][0]
+        if 'limit' in q.keys() or 'cursor' in q.keys():
+            try:
+                limit, web_safe_cursor = parse_page_parameters(q)
+                records, next_cursor, total_count = collection.query_page(index_object, query_string, limit,
+                                                                          web_safe_cursor, fields=fields)
+            except (ValueError, search.Error):
+                write_error(self.response, 400, 'Malformed Data')
+                return
+            add_page_headers(self.response, total_count, limit, next_cursor)
+            write_json(self.request, self.response, encode_records(records, body_format), body_format=body_format)
+            return
+        try:
+            # query is parsed before the status is set, error raised by the stream would follow 200
+            search.Query(query_string=query_string)
+        except (ValueError, search.Error):
+            write_error(self.response, 400, 'Malformed Data')
+            return
+        if stream or body_format != FORMAT_JSON:
+            # whole collection is encoded and sent page after page
+            write_json_stream(self.request, self.response,
+                              collection.iter_records(index_object, query_string, fields=fields,
+                                                      body_format=body_format),
+                              body_format)
+        else:
+            records_json, etag = collection.query_json(index_object, query_string, fields=fields)
+            write_json(self.request, self.response, records_json, etag)
+
+    def post(self):
+        """Add a new resource or JSON array of resources to Full Text Search
+        For JSON array the resources are indexed in batches and the response contains result of every resource.
+        Resources equal to the indexed ones are not indexed again, numbers of created, updated and unchanged resources
+        are returned in Created-Count, Updated-Count and Unchanged-Count headers."""
+        collection = self.collection
+        id_key = collection.resource_type.id_key
+        if self.request.content_type != 'application/json':
+            write_error(self.response, 400, 'Malformed Data')
+            return
+        try:
+            data = json.loads(self.request.body)
+        except ValueError:
+            write_error(self.response, 400, 'Malformed Data')
+            return
+
+        if isinstance(data, list):
+            results = collection.put_many(get_index(collection.index_string), data)
+            statuses = [result['status'] for result in results if result['code'] == search.OperationResult.OK]
+            for result in results:
+                if result['code'] == search.OperationResult.OK and result['status'] != UPSERT_UNCHANGED:
+                    collection.cache.invalidate(result[id_key])
+            if [status for status in statuses if status != UPSERT_UNCHANGED]:
+                bump_write_generation(collection.index_string)
+            json.dump(results, self.response.out)
+            add_cors_headers(self.response)
+            add_upsert_headers(self.response, statuses)
+            self.response.headers['Content-Type'] = 'application/json; charset=utf-8'
+            self.response.status = 200
+        elif collection.resource_type.is_record(data):
+            try:
+                document = collection.resource_type.create_document(data)
+            except ValueError:
+                write_error(self.response, 400, 'Malformed Data')
+                return
+            put_result, status = upsert_documents(get_index(collection.index_string), [document])[0]
+            if status != UPSERT_UNCHANGED:
+                collection.cache.invalidate(data[id_key])
+                bump_write_generation(collection.index_string)
+            if put_result.code == search.OperationResult.OK:
+                add_cors_headers(self.response)
+                add_upsert_headers(self.response, [status])
+                self.response.status = 200
+            else:
+                write_error(self.response, 400, 'Malformed Data')
+        else:
+            write_error(self.response, 400, 'Malformed Data')
+
+    def delete(self):
+        """
+        Delete all resources from Full Text Search
+        Just to clear database for testing purposes. Answers 500 if some resources were not deleted.
+        """
+        stats = self.collection.delete_all(get_index(self.collection.index_string))
+        self.collection.cache.clear()
+        bump_write_generation(self.collection.index_string)
+        if stats["failed"] > 0:
+            write_error(self.response, 500, self.collection.index_string.capitalize() + ' Not Deleted')
+            return
+        add_cors_headers(self.response)
+        self.response.status = 200
@@ -0,0 +1,123 @@
+"""Registry of resource types stored in App Engine search API.
+
+Every resource type declares its index and fields once and the codec of its documents is generated from the
+declaration: validation of posted dictionaries, building of search.Document and converting of found documents back
+to dictionaries. search_algorithm and search_dataset declare their types here, so both run through the same code
+and another resource type needs only its declaration:
+    ALGORITHM = register_resource_type(ResourceType('algorithm', 'algorithms', 'algorithmId', [
+        ('algorithmId', search.TextField), ('algorithmSummary', search.HtmlField), ...]))
+The first declared field is the id of the resource and doc_id of its document.
+"""
+
+
+import json
+from datetime import datetime
+
+from search_backend import search
+from common_functions import has_no_whitespaces, is_visible_ascii, json_field, hash_field, id_hash_field, stored_json
+
+_resource_types = []
+
+
+class ResourceType(object):
+    """Declaration of one resource type and the codec of its documents"""
+
+    __slots__ = ['name', 'index_string', 'id_key', 'fields', 'field_names', '_field_set']
+
+    def __init__(self, name, index_string, id_key, fields):
+        """
+        :param name: type of the resource returned by search of all indexes e.g. algorithm
+        :param index_string: name of the search index
+        :param id_key: name of the first field which is doc_id of the document
+        :param fields: list of (field name, search field class) tuples, all values are strings
+        """
+        if not fields or fields[0][0] != id_key:
+            raise ValueError('The first field of %s must be %s' % (name, id_key))
+        self.name = name
+        self.index_string = index_string
+        self.id_key = id_key
+        self.fields = tuple(fields)
+        self.field_names = [field_name for field_name, _ in fields]
+        self._field_set = frozenset(self.field_names)
+
+    def is_id(self, x):
+        """Checks if its legitimate id aka <search document>.doc_id"""
+        if not isinstance(x, basestring):
+            return False
+        if len(x) == 0 or len(x) > search.MAXIMUM_DOCUMENT_ID_LENGTH:
+            return False
+        if not has_no_whitespaces(x):
+            # search.document.doc_id can not contain whitespaces in name
+            return False
+        if not is_visible_ascii(x):
+            # search.document.doc_id is printable ASCII
+            return False
+        if x[0] == '!':
+            # search.document.doc_id cant begin with '!'
+            return False
+        return True
+
+    def is_record(self, x):
+        """Checks if dictionary object contains exactly the declared fields with legitimate values"""
+        if not isinstance(x, dict) or len(x) != len(self.field_names):
+            return False
+        for field_name in self.field_names:
+            if not isinstance(x.get(field_name), basestring):
+                return False
+        return self.is_id(x[self.id_key])
+
+    def create_document(self, record):
+        """
+        Creates search.Document of the record with date of indexing, hashes of the record and of its id and the record
+        stored as JSON
+        :param record: dictionary accepted by is_record()
+        :rtype : google.appengine.api.search.Document
+        """
+        document_fields = [field_class(name=field_name, value=record[field_name])
+                           for field_name, field_class in self.fields]
+        document_fields.append(search.DateField(name='date', value=datetime.now()))
+        record = dict((field_name, record[field_name]) for field_name in self.field_names)
+        document_fields.append(hash_field(record))
+        document_fields.append(id_hash_field(record[self.id_key]))
+        document_json_field = json_field(record)
+        if document_json_field is not None:
+            document_fields.append(document_json_field)
+        return search.Document(doc_id=record[self.id_key], fields=document_fields)
+
+    def document_to_record(self, document, fields=None):
+        """
+        Returns dictionary of the declared fields of search.Document
+        :param document:
+        :param fields: list of names of the only fields to return or None for all fields
+        :rtype: dict
+        """
+        if fields is None:
+            field_set = self._field_set
+        else:
+            field_set = frozenset(fields)
+        record = dict((field.name, field.value) for field in document.fields if field.name in field_set)
+        if fields is not None and self.id_key in field_set:
+            # id is not a returned field of projected documents
+            record[self.id_key] = document.doc_id
+        return record
+
+    def document_to_json(self, document):
+        """Returns JSON of document_to_record() result, JSON stored at index time is used when the document has it"""
+        document_json = stored_json(document)
+        if document_json is None:
+            document_json = json.dumps(self.document_to_record(document))
+        return document_json
+
+
+def register_resource_type(resource_type):
+    """Adds resource type to the registry and returns it"""
+    for registered in _resource_types:
+        if registered.name == resource_type.name or registered.index_string == resource_type.index_string:
+            raise ValueError('Resource type %s is already registered' % resource_type.name)
+    _resource_types.append(resource_type)
+    return resource_type
+
+
+def get_resource_types():
+    """Returns list of registered resource types in the order of registration"""
+    return list(_resource_types)
@@ -0,0 +1,75 @@
+"""Api for searching algorithms and datasets together in App Engine search API."""
+
+
+from urlparse import urlparse, parse_qs
+
+import webapp2
+import json
+from search_backend import search, get_index
+from common_functions import write_error, write_json, parse_page_parameters, DEFAULT_PAGE_LIMIT
+import search_algorithm
+import search_dataset
+
+SEARCH_PARAMETERS = ['query', 'limit']
+# name of returned expression with match score of document
+_SCORE_EXPRESSION = 'score'
+# resource types whose indexes are searched together
+SEARCHED_TYPES = [search_algorithm.ALGORITHM, search_dataset.DATASET]
+
+
+def search_all(query_string='', limit=DEFAULT_PAGE_LIMIT):
+    """
+    Queries indexes of all SEARCHED_TYPES concurrently and merges their results by score. Every <index_object>.search_async()
+    is called before waiting for the first result, so it takes as long as the slowest index, not the sum of all.
+    :param query_string:
+    :param limit: maximum number of results of every index
+    :rtype: tuple: (list of dictionaries of all fields except date field with type and score, the best score first,
+     dictionary of number of found documents by type)
+    """
+    futures = []
+    for resource_type in SEARCHED_TYPES:
+        query_options = search.QueryOptions(limit=limit,
+                                            sort_options=search.SortOptions(match_scorer=search.MatchScorer()),
+                                            number_found_accuracy=search.MAXIMUM_NUMBER_FOUND_ACCURACY,
+                                            returned_expressions=[search.FieldExpression(name=_SCORE_EXPRESSION,
+                                                                                         expression='_score')])
+        query = search.Query(query_string=query_string, options=query_options)
+        futures.append((resource_type, get_index(resource_type.index_string).search_async(query)))
+    results_list = []
+    number_found = {}
+    for resource_type, future in futures:
+        results = future.get_result()
+        number_found[resource_type.name] = results.number_found
+        for found_document in results:
+            result = resource_type.document_to_record(found_document)
+            result['type'] = resource_type.name
+            result['score'] = 0.0
+            for expression in found_document.expressions:
+                if expression.name == _SCORE_EXPRESSION:
+                    result['score'] = expression.value
+            results_list.append(result)
+    # sort is stable so results of one index with equal scores keep their order
+    results_list.sort(key=lambda result: -result['score'])
+    return results_list, number_found
+
+
+class SearchHandler(webapp2.RequestHandler):
+    def get(self):
+        """GET algorithms and datasets matching query as one list ordered by score
+        Limit parameter is the maximum number of results of every type.
+        """
+        url = urlparse(self.request.uri)
+        q = parse_qs(url.query)
+        if url.query and not [key for key in q.keys() if key in SEARCH_PARAMETERS]:
+            write_error(self.response, 400, 'Malformed Data')
+            return
+        query_string = ''
+        if 'query' in q.keys():
+            query_string = q['query'][0]
+        try:
+            limit, _ = parse_page_parameters(q)
+            results_list, number_found = search_all(query_string, limit)
+        except (ValueError, search.Error):
+            write_error(self.response, 400, 'Malformed Data')
+            return
+        write_json(self.request, self.response, json.dumps({"results": results_list, "found": number_found}))
@@ -0,0 +1,54 @@
+"""Selects search backend used by the handlers.
+
+Every index used by the handlers is obtained by get_index(name) and has the methods of
+google.appengine.api.search.Index: put, get, delete, get_range and search with cursors (and their *_async versions).
+Two backends are available:
+    BACKEND_FTS - App Engine Full Text Search, the default
+    BACKEND_MEMORY - memory_search.Index, in-process inverted index for running without App Engine
+The backend is chosen by SEARCH_BACKEND environment variable or set_backend(). Without App Engine SDK the memory
+backend is always used and search is memory_search module which has the same classes as the search API.
+memory_search is imported only when the memory backend is used, so it does not add to start of App Engine instances.
+"""
+
+
+import os
+
+import metrics
+
+try:
+    from google.appengine.api import search
+except ImportError:
+    import memory_search as search
+
+BACKEND_FTS = 'fts'
+BACKEND_MEMORY = 'memory'
+
+_backend = os.getenv('SEARCH_BACKEND', BACKEND_FTS)
+# search.Index objects by name, they only hold the name and are built once per instance
+_fts_indexes = {}
+
+
+def set_backend(backend):
+    """Sets backend returned by get_index(). Use BACKEND_FTS or BACKEND_MEMORY."""
+    global _backend
+    if backend not in [BACKEND_FTS, BACKEND_MEMORY]:
+        raise ValueError('Unknown search backend %s' % backend)
+    _backend = backend
+
+
+def get_backend():
+    if search.__name__ == 'memory_search':
+        return BACKEND_MEMORY
+    return _backend
+
+
+def get_index(name):
+    """Returns index object of the configured backend, instrumented when the current request is recorded"""
+    if get_backend() == BACKEND_MEMORY:
+        import memory_search
+        return metrics.instrument_index(memory_search.Index(name=name))
+    index_object = _fts_indexes.get(name)
+    if index_object is None:
+        index_object = search.Index(name=name)
+        _fts_indexes[name] = index_object
+    return metrics.instrument_index(index_object)
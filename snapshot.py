@@ -0,0 +1,162 @@
+"""Snapshots of whole search indexes for backup and cloning of data between applications.
+
+Snapshot is gzip compressed text with one JSON object per line. The first line is the header
+{"snapshot": SNAPSHOT_VERSION, "index": name of the exported index, "created": ISO date}, every other line is
+one chunk {"documents": [...]} of at most 200 documents, so restore puts every chunk with one RPC.
+Document is {"id": doc_id, "rank": rank, "language": language, "fields": [[name, field class, value, language]]}
+with all fields including the date field and the stored JSON. Date values are ISO dates.
+"""
+
+
+import gzip
+import json
+import logging
+import time
+from collections import deque
+from datetime import date, datetime
+
+from search_backend import search
+from common_functions import iter_document_pages
+
+SNAPSHOT_VERSION = 1
+RESTORE_BATCHES_IN_FLIGHT = 4
+_FIELD_CLASSES = ['TextField', 'HtmlField', 'AtomField', 'NumberField', 'DateField']
+_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def document_to_snapshot(document):
+    """Returns dictionary of search.Document written to snapshot"""
+    fields = []
+    for field in document.fields:
+        field_class = type(field).__name__
+        if field_class not in _FIELD_CLASSES:
+            raise ValueError('Field %s of document %s is %s which is not supported by snapshots' %
+                             (field.name, document.doc_id, field_class))
+        value = field.value
+        if isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        fields.append([field.name, field_class, value, field.language])
+    return {"id": document.doc_id, "rank": document.rank, "language": document.language, "fields": fields}
+
+
+def _parse_date(value):
+    if 'T' not in value:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    if '.' in value:
+        return datetime.strptime(value, _DATETIME_FORMAT + '.%f')
+    return datetime.strptime(value, _DATETIME_FORMAT)
+
+
+def snapshot_to_document(entry):
+    """Returns search.Document of dictionary returned by document_to_snapshot()"""
+    fields = []
+    for name, field_class, value, language in entry['fields']:
+        if field_class not in _FIELD_CLASSES:
+            raise ValueError('Unknown field class %s' % field_class)
+        if field_class == 'DateField':
+            value = _parse_date(value)
+        if language is None:
+            # number and date fields do not have language
+            fields.append(getattr(search, field_class)(name=name, value=value))
+        else:
+            fields.append(getattr(search, field_class)(name=name, value=value, language=language))
+    return search.Document(doc_id=entry['id'], fields=fields, language=entry['language'], rank=entry['rank'])
+
+
+def export_index(index_object, output_file, progress=None):
+    """
+    Writes all documents of index to snapshot. Documents are read by get_range in pages of 1000 and the next page
+    is fetched while the current one is written.
+    :param index_object:
+    :param output_file: file opened for binary writing
+    :param progress: optional function called with the statistics dictionary after every written chunk
+    :rtype: dict: {"documents": number of exported documents, "chunks": number of chunks, "seconds": elapsed time}
+    """
+    start_time = time.time()
+    stats = {"documents": 0, "chunks": 0, "seconds": 0.0}
+    snapshot_file = gzip.GzipFile(fileobj=output_file, mode='wb')
+    try:
+        snapshot_file.write(json.dumps({"snapshot": SNAPSHOT_VERSION, "index": index_object.name,
+                                        "created": datetime.utcnow().isoformat()}) + '\n')
+        pages = iter_document_pages(index_object, page_size=search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST,
+                                    prefetch=search.MAXIMUM_DOCUMENTS_RETURNED_PER_SEARCH //
+                                    search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST)
+        for page in pages:
+            if not page:
+                continue
+            snapshot_file.write(json.dumps({"documents": [document_to_snapshot(document) for document in page]}) +
+                                '\n')
+            stats["documents"] += len(page)
+            stats["chunks"] += 1
+            stats["seconds"] = time.time() - start_time
+            if progress is not None:
+                progress(stats)
+    finally:
+        snapshot_file.close()
+    stats["seconds"] = time.time() - start_time
+    logging.info('Exported %d documents of index %s in %d chunks in %.2f s', stats["documents"], index_object.name,
+                 stats["chunks"], stats["seconds"])
+    return stats
+
+
+def read_snapshot_header(snapshot_file):
+    """Returns header of snapshot opened by gzip.GzipFile"""
+    try:
+        header = json.loads(snapshot_file.readline())
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get('snapshot') != SNAPSHOT_VERSION:
+        raise ValueError('Not a snapshot of version %d' % SNAPSHOT_VERSION)
+    return header
+
+
+def restore_index(index_object, input_file, batches_in_flight=RESTORE_BATCHES_IN_FLIGHT, progress=None):
+    """
+    Puts all documents of snapshot to index, documents with the same doc_id are replaced. Next chunk is read
+    and decoded while up to batches_in_flight put_async batches are running.
+    :param index_object:
+    :param input_file: file opened for binary reading
+    :param batches_in_flight: maximum number of put batches not finished yet
+    :param progress: optional function called with the statistics dictionary after every finished batch
+    :rtype: dict: {"restored": number of indexed documents, "failed": number of not indexed documents,
+                   "batches": number of put RPCs, "seconds": elapsed time, "docsPerSecond": throughput}
+    """
+    start_time = time.time()
+    stats = {"restored": 0, "failed": 0, "batches": 0, "seconds": 0.0, "docsPerSecond": 0.0}
+    pending = deque()
+
+    def finish_batch():
+        put_future, batch_length = pending.popleft()
+        try:
+            put_results = put_future.get_result()
+        except search.PutError as e:
+            put_results = e.results
+        restored = len([result for result in put_results if result.code == search.OperationResult.OK])
+        stats["restored"] += restored
+        stats["failed"] += batch_length - restored
+        stats["batches"] += 1
+        stats["seconds"] = time.time() - start_time
+        if stats["seconds"] > 0:
+            stats["docsPerSecond"] = stats["restored"] / stats["seconds"]
+        if progress is not None:
+            progress(stats)
+
+    snapshot_file = gzip.GzipFile(fileobj=input_file, mode='rb')
+    try:
+        read_snapshot_header(snapshot_file)
+        for line in iter(snapshot_file.readline, ''):
+            documents = [snapshot_to_document(entry) for entry in json.loads(line)['documents']]
+            if not documents:
+                continue
+            while len(pending) >= batches_in_flight:
+                finish_batch()
+            pending.append((index_object.put_async(documents), len(documents)))
+        while pending:
+            finish_batch()
+    finally:
+        snapshot_file.close()
+    stats["seconds"] = time.time() - start_time
+    logging.info('Restored %d documents to index %s in %d batches in %.2f s (%.1f docs/s), %d failed',
+                 stats["restored"], index_object.name, stats["batches"], stats["seconds"], stats["docsPerSecond"],
+                 stats["failed"])
+    return stats
@@ -1,6 +1,16 @@
 import webapp2
 import json
 import os
+import threading
+from common_functions import make_etag, write_json
+from cache import LRUCache
+
+_SPEC_PATH = 'static/swagger.json'
+_spec = None
+_spec_lock = threading.Lock()
+# serialized spec with its ETag for every url returned by get_search_url(), the origin comes from the client
+# so the number of cached responses is bounded
+swagger_cache = LRUCache(max_size=100, ttl=24 * 60 * 60)
 
 
 def get_search_url():
@@ -10,20 +20,39 @@ def get_search_url():
         return 'http://localhost:8080'
 
 
-class SwaggerHandler(webapp2.RequestHandler):
-    def get(self):
-        data = json.load(open('static/swagger.json'))
+def load_spec():
+    """Returns swagger.json parsed once per instance"""
+    global _spec
+    if _spec is None:
+        with _spec_lock:
+            if _spec is None:
+                with open(_SPEC_PATH) as spec_file:
+                    _spec = json.load(spec_file)
+    return _spec
+
+
+def get_swagger_json(url):
+    """
+    Returns swagger.json with schemes and host changed to url, serialized once per url
+    :param url: get_search_url()
+    :rtype: tuple: (str: JSON, str: ETag)
+    """
+    cached = swagger_cache.get(url)
+    if cached is None:
+        data = dict(load_spec())
         # changing schemes and host in swagger.json to get_search_url()
-        url = get_search_url()
         data['host'] = url.split('://')[1]
-        del data['schemes'][:]
-        data['schemes'].append(url.split('://')[0])
-        # js = json.dumps(data)
-        self.response.headers.add_header("Access-Control-Allow-Origin", "*")
-        self.response.headers.add_header('Access-Control-Allow-Methods', 'POST, GET, DELETE, PUT, OPTIONS')
-        self.response.headers.add_header('Access-Control-Allow-Headers', 'Content-Type, api_key, Authorization, x-requested-with, Total-Count, Total-Pages, Error-Message')
-        self.response.headers['Content-Type'] = 'application/json'
-        json.dump(data, self.response.out)
+        data['schemes'] = [url.split('://')[0]]
+        swagger_json = json.dumps(data)
+        cached = (swagger_json, make_etag(swagger_json))
+        swagger_cache.set(url, cached)
+    return cached
+
+
+class SwaggerHandler(webapp2.RequestHandler):
+    def get(self):
+        swagger_json, etag = get_swagger_json(get_search_url())
+        write_json(self.request, self.response, swagger_json, etag)
 
 
 app = webapp2.WSGIApplication([
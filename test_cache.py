@@ -0,0 +1,67 @@
+"""Tests of per instance caches"""
+import unittest
+from cache import LRUCache
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = LRUCache(max_size=2, ttl=60, clock=self.clock)
+
+    def test_get_hit_and_miss(self):
+        """Tests if set value is returned and hits and misses are counted"""
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.set('a', {'x': 1})
+        self.assertEqual({'x': 1}, self.cache.get('a'))
+        self.assertEqual({"hits": 1, "misses": 1, "size": 1, "bytes": 0}, self.cache.stats())
+
+    def test_least_recently_used_evicted(self):
+        """Tests if the least recently used entry is evicted when max_size is exceeded"""
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertIsNone(self.cache.get('b'), msg='Least recently used entry was not evicted')
+        self.assertEqual(1, self.cache.get('a'))
+        self.assertEqual(3, self.cache.get('c'))
+
+    def test_ttl_expired(self):
+        """Tests if entry is not returned after ttl"""
+        self.cache.set('a', 1)
+        self.clock.now += 59
+        self.assertEqual(1, self.cache.get('a'))
+        self.clock.now += 1
+        self.assertIsNone(self.cache.get('a'), msg='Expired entry was returned')
+
+    def test_stale_set_after_invalidate(self):
+        """Tests if value loaded before invalidate is not stored"""
+        generation = self.cache.generation()
+        self.cache.invalidate('a')
+        self.cache.set('a', 'stale', generation)
+        self.assertIsNone(self.cache.get('a'), msg='Stale value was stored')
+        self.cache.set('a', 'fresh', self.cache.generation())
+        self.assertEqual('fresh', self.cache.get('a'))
+
+    def test_max_bytes(self):
+        """Tests if entries are evicted when total size exceeds max_bytes and too big entry is not stored"""
+        cache = LRUCache(max_size=None, ttl=60, max_bytes=10, clock=self.clock)
+        cache.set('a', 'aaaa', size=4)
+        cache.set('b', 'bbbb', size=4)
+        cache.set('c', 'cccc', size=4)
+        self.assertIsNone(cache.get('a'), msg='Entry was not evicted when max_bytes was exceeded')
+        self.assertEqual(8, cache.stats()['bytes'])
+        cache.set('d', 'd' * 11, size=11)
+        self.assertIsNone(cache.get('d'), msg='Entry bigger than max_bytes was stored')
+        self.assertEqual('cccc', cache.get('c'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+"""Tests of bulk import tool. They run on the memory backend and do not need App Engine testbed."""
+import unittest
+import json
+import os
+import shutil
+import sys
+import tempfile
+import webtest
+import main
+import memory_search
+import search_backend
+import search_algorithm
+import search_dataset
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tools'))
+import import_documents
+
+
+def create_test_algorithm_list(data_list, length):
+    """Prepare test data as list by name data_list given by reference
+     of length algorithm descriptions"""
+    for i in range(length):
+        data = {}
+        data['algorithmId'] = 'algorithmId' + str(i)
+        data['algorithmSummary'] = 'algorithmSummary' + str(i)
+        data['displayName'] = 'displayName' + str(i)
+        data['linkURL'] = 'linkURL' + str(i)
+        data_list.append(data)
+
+
+class ImportTestCase(unittest.TestCase):
+    def setUp(self):
+        memory_search.clear_all()
+        search_backend.set_backend(search_backend.BACKEND_MEMORY)
+        search_algorithm.algorithm_cache.clear()
+        search_algorithm.algorithm_query_cache.clear()
+        self.testapp = webtest.TestApp(main.application)
+        self.directory = tempfile.mkdtemp()
+        self.posted_batches = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        search_backend.set_backend(search_backend.BACKEND_FTS)
+        memory_search.clear_all()
+
+    def post_batch(self, batch):
+        """Sends batch to the application like http_batch_sender()"""
+        self.posted_batches.append(len(batch))
+        response = self.testapp.post('/' + search_algorithm._INDEX_STRING + '/', params=json.dumps(batch),
+                                     content_type='application/json')
+        return json.loads(response.normal_body)
+
+    def write_source(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as source_file:
+            source_file.write(''.join(lines))
+        return path
+
+    def indexed_algorithms(self):
+        return json.loads(self.testapp.get('/algorithms/?stream=1').normal_body)
+
+    def test_import_ndjson(self):
+        """Tests if valid records are imported in batches of 200 and invalid lines are counted"""
+        data_list = []
+        create_test_algorithm_list(data_list, 450)
+        lines = [json.dumps(data) + '\n' for data in data_list]
+        lines[10:10] = ['not JSON\n', '\n', json.dumps({'algorithmId': 'x'}) + '\n']
+        path = self.write_source('algorithms.ndjson', lines)
+        checkpoint = import_documents.new_checkpoint(path, 'algorithm')
+        with open(path, 'rb') as source_file:
+            import_documents.import_records(import_documents.iter_ndjson_records(source_file),
+                                            search_algorithm.ALGORITHM, self.post_batch, checkpoint, concurrency=2)
+        self.assertEqual([200, 200, 50], self.posted_batches)
+        self.assertEqual((450, 0, 2, os.path.getsize(path), True),
+                         (checkpoint['imported'], checkpoint['failed'], checkpoint['invalid'], checkpoint['offset'],
+                          checkpoint['finished']))
+        self.assertItemsEqual(data_list, self.indexed_algorithms())
+
+    def test_import_resume(self):
+        """Tests if import interrupted by error resumes after the last checkpoint"""
+        data_list = []
+        create_test_algorithm_list(data_list, 500)
+        path = self.write_source('algorithms.ndjson', [json.dumps(data) + '\n' for data in data_list])
+        checkpoint_path = path + '.checkpoint'
+
+        def failing_post_batch(batch):
+            if len(self.posted_batches) == 1:
+                raise IOError('Connection reset')
+            return self.post_batch(batch)
+
+        checkpoint = import_documents.load_checkpoint(checkpoint_path, path, 'algorithm')
+        with open(path, 'rb') as source_file:
+            with self.assertRaises(IOError):
+                import_documents.import_records(import_documents.iter_ndjson_records(source_file),
+                                                search_algorithm.ALGORITHM, failing_post_batch, checkpoint,
+                                                lambda state: import_documents.save_checkpoint(checkpoint_path, state),
+                                                concurrency=1)
+        checkpoint = import_documents.load_checkpoint(checkpoint_path, path, 'algorithm')
+        self.assertEqual(200, checkpoint['imported'])
+        self.assertFalse(checkpoint['finished'])
+        self.posted_batches = []
+        with open(path, 'rb') as source_file:
+            import_documents.import_records(import_documents.iter_ndjson_records(source_file, checkpoint['offset']),
+                                            search_algorithm.ALGORITHM, self.post_batch, checkpoint, concurrency=1)
+        self.assertEqual([200, 100], self.posted_batches, msg='Import did not resume after the first batch')
+        self.assertEqual(500, checkpoint['imported'])
+        self.assertItemsEqual(data_list, self.indexed_algorithms())
+        with self.assertRaises(ValueError):
+            import_documents.load_checkpoint(checkpoint_path, path, 'dataset')
+
+    def test_save_checkpoint_twice(self):
+        """Tests if checkpoint is replaced by the next one also where rename does not replace files like on Windows"""
+        path = self.write_source('algorithms.ndjson', [])
+        checkpoint_path = path + '.checkpoint'
+        rename = os.rename
+
+        def windows_rename(source, target):
+            if os.path.exists(target):
+                raise OSError(17, 'File exists')
+            rename(source, target)
+
+        for rename_replaces in [True, False]:
+            checkpoint = import_documents.new_checkpoint(path, 'algorithm')
+            import_documents.RENAME_REPLACES = rename_replaces
+            if not rename_replaces:
+                os.rename = windows_rename
+            try:
+                for offset in [10, 20]:
+                    checkpoint['offset'] = offset
+                    import_documents.save_checkpoint(checkpoint_path, checkpoint)
+            finally:
+                os.rename = rename
+                import_documents.RENAME_REPLACES = os.name != 'nt'
+            self.assertEqual(20, import_documents.load_checkpoint(checkpoint_path, path, 'algorithm')['offset'])
+            self.assertFalse(os.path.exists(checkpoint_path + '.tmp'))
+        # interrupted between removing the old checkpoint and renaming the new one
+        os.rename(checkpoint_path, checkpoint_path + '.tmp')
+        self.assertEqual(20, import_documents.load_checkpoint(checkpoint_path, path, 'algorithm')['offset'])
+
+    def test_iter_csv_records(self):
+        """Tests if CSV rows with quoted multiline values are read and reading resumes at yielded offset"""
+        path = self.write_source('datasets.csv', ['datasetId,datasetSummary,displayName,linkURL\r\n',
+                                                  'datasetId0,"<p>first\r\nline</p>",displayName0,linkURL0\r\n',
+                                                  'datasetId1,short row\r\n',
+                                                  'datasetId2,"<p>x, y</p>",displayName2,linkURL2\r\n'])
+        with open(path, 'rb') as source_file:
+            records = list(import_documents.iter_csv_records(source_file))
+            self.assertEqual(3, len(records))
+            self.assertDictEqual({'datasetId': 'datasetId0', 'datasetSummary': '<p>first\r\nline</p>',
+                                  'displayName': 'displayName0', 'linkURL': 'linkURL0'}, records[0][0])
+            self.assertTrue(search_dataset.DATASET.is_record(records[0][0]))
+            self.assertIsNone(records[1][0])
+            self.assertEqual(os.path.getsize(path), records[2][1])
+            resumed = list(import_documents.iter_csv_records(source_file, records[1][1]))
+        self.assertEqual([records[2]], resumed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""Tests of in-process search backend. They do not need App Engine testbed."""
+import unittest
+import json
+import time
+import webtest
+import main
+import memory_search
+import search_backend
+import search_algorithm
+import common_functions
+
+
+def create_test_algorithm_list(data_list, length):
+    """Prepare test data as list by name data_list given by reference
+     of length algorithm descriptions"""
+    for i in range(length):
+        data = {}
+        data['algorithmId'] = 'algorithmId' + str(i)
+        data['algorithmSummary'] = 'algorithmSummary' + str(i)
+        data['displayName'] = 'displayName' + str(i)
+        data['linkURL'] = 'linkURL' + str(i)
+        data_list.append(data)
+
+
+def create_memory_documents_list(data_list, documents, length):
+    """ Prepare test documents with search_algorithm.create_document"""
+    for i in range(length):
+        document = search_algorithm.create_document(data_list[i]['algorithmId'],
+                                                    data_list[i]['algorithmSummary'],
+                                                    data_list[i]['displayName'],
+                                                    data_list[i]['linkURL'])
+        documents.append(document)
+
+
+class MemorySearchTestCaseIndex(unittest.TestCase):
+    def setUp(self):
+        memory_search.clear_all()
+        self.index = memory_search.Index(name='algorithms')
+        self.data_list = []
+        create_test_algorithm_list(self.data_list, 250)
+        documents = []
+        create_memory_documents_list(self.data_list, documents, 250)
+        self.index.put(documents[:200])
+        self.index.put(documents[200:])
+
+    def tearDown(self):
+        memory_search.clear_all()
+
+    def search_ids(self, query_string):
+        results = self.index.search(memory_search.Query(query_string=query_string,
+                                                        options=memory_search.QueryOptions(limit=1000)))
+        return sorted([document.doc_id for document in results])
+
+    def test_get_and_shared_storage(self):
+        """Tests if document put by one Index object is returned by another with the same name"""
+        document = memory_search.Index(name='algorithms').get('algorithmId7')
+        self.assertIsNotNone(document)
+        self.assertEqual('linkURL7', document.field('linkURL').value)
+        self.assertIsNone(memory_search.Index(name='datasets').get('algorithmId7'))
+
+    def test_get_range_pages(self):
+        """Tests if get_range returns documents in doc_id order continuing after start_id"""
+        first_page = self.index.get_range(ids_only=True)
+        self.assertEqual(100, len(first_page.results))
+        ids = [document.doc_id for document in first_page]
+        self.assertEqual(sorted(ids), ids, msg='Documents are not in doc_id order')
+        second_page = self.index.get_range(ids[-1], include_start_object=False)
+        self.assertEqual(100, len(second_page.results))
+        self.assertLess(ids[-1], second_page.results[0].doc_id)
+
+    def test_search_and_or_not(self):
+        """Tests evaluation of AND, OR, NOT, field restriction and parentheses"""
+        self.assertEqual(['algorithmId102', 'algorithmId23'], self.search_ids('displayName102 OR algorithmId23'))
+        self.assertEqual(['algorithmId23'], self.search_ids('algorithmId23 AND displayName23'))
+        self.assertEqual([], self.search_ids('algorithmId23 displayName102'))
+        self.assertEqual(['algorithmId23'], self.search_ids('algorithmId:algorithmId23'))
+        self.assertEqual([], self.search_ids('linkURL:algorithmId23'))
+        self.assertEqual(['algorithmId102'], self.search_ids('(displayName102 OR algorithmId23) NOT algorithmId23'))
+        self.assertEqual(249, len(self.search_ids('NOT displayName5')))
+        self.assertRaises(memory_search.QueryError, self.search_ids, '(displayName102')
+
+    def test_search_cursor(self):
+        """Tests if following cursor returns all documents exactly once and number_found is right"""
+        cursor = memory_search.Cursor()
+        ids = []
+        while cursor:
+            results = self.index.search(memory_search.Query(query_string='',
+                                                            options=memory_search.QueryOptions(limit=60,
+                                                                                               cursor=cursor)))
+            self.assertEqual(250, results.number_found)
+            ids.extend([document.doc_id for document in results])
+            cursor = results.cursor
+        self.assertItemsEqual([data['algorithmId'] for data in self.data_list], ids)
+
+    def test_put_replaces_and_delete(self):
+        """Tests if document with the same doc_id is replaced in posting lists and delete removes it"""
+        self.index.put(search_algorithm.create_document('algorithmId7', 'newSummary', 'newName', 'newURL'))
+        self.assertEqual([], self.search_ids('displayName7'))
+        self.assertEqual(['algorithmId7'], self.search_ids('newName'))
+        self.index.delete(['algorithmId7', 'xyz1'])
+        self.assertIsNone(self.index.get('algorithmId7'))
+        self.assertEqual([], self.search_ids('newName'))
+        self.assertEqual(249, len(self.search_ids('')))
+
+    def test_iter_document_pages_prefetch(self):
+        """Tests if pages of get_range and search paths are the same for every prefetch depth"""
+        for query_string in ['', 'NOT displayName5']:
+            expected = None
+            for prefetch in [0, 1, 3]:
+                pages = list(common_functions.iter_document_pages(self.index, query_string, page_size=60,
+                                                                  prefetch=prefetch))
+                self.assertEqual([60, 60, 60, 60], [len(page) for page in pages[:4]])
+                ids = [document.doc_id for page in pages for document in page]
+                if expected is None:
+                    expected = ids
+                self.assertEqual(expected, ids, msg='Different documents with prefetch %d' % prefetch)
+
+    def test_iter_document_pages_prefetch_overlaps_latency(self):
+        """Tests if latency of the next page is hidden behind processing of the current page"""
+        def consume(prefetch):
+            start_time = time.time()
+            for _ in common_functions.iter_document_pages(self.index, page_size=50, prefetch=prefetch):
+                time.sleep(0.05)
+            return time.time() - start_time
+        memory_search.set_rpc_latency(0.05)
+        try:
+            serial_seconds = consume(0)
+            prefetch_seconds = consume(1)
+        finally:
+            memory_search.set_rpc_latency(0.0)
+        self.assertLess(prefetch_seconds, serial_seconds * 0.8)
+
+
+class MemorySearchTestCaseHandlers(unittest.TestCase):
+    """Runs the handlers on memory backend without search stub"""
+    def setUp(self):
+        memory_search.clear_all()
+        search_backend.set_backend(search_backend.BACKEND_MEMORY)
+        search_algorithm.algorithm_cache.clear()
+        search_algorithm.algorithm_query_cache.clear()
+        self.testapp = webtest.TestApp(main.application)
+
+    def tearDown(self):
+        search_backend.set_backend(search_backend.BACKEND_FTS)
+        memory_search.clear_all()
+
+    def test_AlgorithmsHandler_POST_and_GET(self):
+        """Tests if algorithms posted to memory backend are returned by listing, query and id"""
+        data_list = []
+        create_test_algorithm_list(data_list, 101)
+        response = self.testapp.post('/algorithms/', params=json.dumps(data_list),
+                                     content_type='application/json; charset=utf-8')
+        self.assertEqual(200, response.status_int)
+        response = self.testapp.get('/algorithms/')
+        self.assertItemsEqual(data_list, json.loads(response.normal_body))
+        response = self.testapp.get('/algorithms/?query=displayName102 OR algorithmId23')
+        self.assertItemsEqual([data_list[23]], json.loads(response.normal_body))
+        response = self.testapp.get('/algorithms/algorithmId5')
+        self.assertDictEqual(data_list[5], json.loads(response.normal_body))
+
+
+if __name__ == '__main__':
+    unittest.main()
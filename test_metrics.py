@@ -0,0 +1,117 @@
+"""Tests of request metrics. They run on the memory backend and do not need App Engine testbed."""
+import unittest
+import json
+import webtest
+import main
+import metrics
+import memory_search
+import search_backend
+import search_algorithm
+
+
+def create_test_algorithm_list(data_list, length):
+    """Prepare test data as list by name data_list given by reference
+     of length algorithm descriptions"""
+    for i in range(length):
+        data = {}
+        data['algorithmId'] = 'algorithmId' + str(i)
+        data['algorithmSummary'] = 'algorithmSummary' + str(i)
+        data['displayName'] = 'displayName' + str(i)
+        data['linkURL'] = 'linkURL' + str(i)
+        data_list.append(data)
+
+
+class MetricsTestCaseHistogram(unittest.TestCase):
+    def test_histogram_lines(self):
+        """Tests if buckets are cumulative and sum and count are written for every label values"""
+        histogram = metrics.Histogram('test_seconds', 'Test.', ['route'], [0.1, 1.0])
+        histogram.observe(('/a',), 0.05)
+        histogram.observe(('/a',), 0.5)
+        histogram.observe(('/a',), 5)
+        self.assertEqual(['# HELP test_seconds Test.',
+                          '# TYPE test_seconds histogram',
+                          'test_seconds_bucket{route="/a",le="0.1"} 1',
+                          'test_seconds_bucket{route="/a",le="1.0"} 2',
+                          'test_seconds_bucket{route="/a",le="+Inf"} 3',
+                          'test_seconds_sum{route="/a"} 5.55',
+                          'test_seconds_count{route="/a"} 3'], histogram.lines())
+
+
+class MetricsTestCaseMiddleware(unittest.TestCase):
+    def setUp(self):
+        memory_search.clear_all()
+        search_backend.set_backend(search_backend.BACKEND_MEMORY)
+        search_algorithm.algorithm_cache.clear()
+        search_algorithm.algorithm_query_cache.clear()
+        metrics.reset_metrics()
+        metrics.set_sample_rate(1.0)
+        self.testapp = webtest.TestApp(main.application)
+        data_list = []
+        create_test_algorithm_list(data_list, 250)
+        self.testapp.post('/algorithms/', params=json.dumps(data_list),
+                          content_type='application/json; charset=utf-8')
+        metrics.reset_metrics()
+
+    def tearDown(self):
+        metrics.set_sample_rate(1.0)
+        metrics.reset_metrics()
+        search_backend.set_backend(search_backend.BACKEND_FTS)
+        memory_search.clear_all()
+
+    def metric_value(self, line_start):
+        """Returns value of the metric line starting with line_start"""
+        for line in metrics.render_metrics().split('\n'):
+            if line.startswith(line_start + ' '):
+                return float(line.split(' ')[-1])
+        self.fail('Metric %s not found' % line_start)
+
+    def test_GET_recorded_by_route(self):
+        """Tests if request is counted under the route template with its RPCs and response bytes"""
+        response = self.testapp.get('/algorithms/algorithmId5')
+        self.assertEqual(1, self.metric_value(
+            'http_requests_total{route="/algorithms/(.+)",method="GET",status="200"}'))
+        self.assertEqual(1, self.metric_value(
+            'search_rpc_calls_per_request_sum{route="/algorithms/(.+)",method="GET"}'))
+        self.assertEqual(len(response.body), self.metric_value(
+            'http_response_bytes_sum{route="/algorithms/(.+)",method="GET"}'))
+        self.assertEqual(1, self.metric_value('search_rpc_duration_seconds_count{index="algorithms",call="get"}'))
+
+    def test_GET_stream_recorded_while_iterated(self):
+        """Tests if RPCs made while streamed body is written are counted to the request"""
+        response = self.testapp.get('/algorithms/?stream=1')
+        self.assertEqual(250, len(json.loads(response.normal_body)))
+        # 3 pages of get_range and the empty one
+        self.assertEqual(4, self.metric_value(
+            'search_rpc_calls_per_request_sum{route="/algorithms/",method="GET"}'))
+        self.assertEqual(len(response.body), self.metric_value(
+            'http_response_bytes_sum{route="/algorithms/",method="GET"}'))
+
+    def test_sampling_off(self):
+        """Tests if nothing is recorded and index is not wrapped with sample rate 0"""
+        metrics.set_sample_rate(0)
+        self.testapp.get('/algorithms/algorithmId5')
+        self.assertNotIn('http_requests_total{', metrics.render_metrics())
+        self.assertIsInstance(search_backend.get_index('algorithms'), memory_search.Index)
+
+    def test_metrics_endpoint(self):
+        """Tests if /metrics returns Prometheus text format including the unmatched route"""
+        self.testapp.get('/xyz', expect_errors=True)
+        response = self.testapp.get('/metrics')
+        self.assertEqual(200, response.status_int)
+        self.assertEqual('text/plain', response.content_type)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', response.normal_body)
+        self.assertIn('http_requests_total{route="unmatched",method="GET",status="404"} 1', response.normal_body)
+
+    def test_metrics_admin_only(self):
+        """Tests if app.yaml restricts /metrics to administrators before the catch-all handler"""
+        from google.appengine.api import appinfo
+        with open('app.yaml') as app_yaml:
+            handlers = appinfo.LoadSingleAppInfo(app_yaml).handlers
+        urls = [handler.url for handler in handlers]
+        metrics_handler = handlers[urls.index('/metrics')]
+        self.assertLess(urls.index('/metrics'), urls.index('.*'))
+        self.assertEqual(('admin', 'unauthorized'), (metrics_handler.login, metrics_handler.auth_fail_action))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""Tests of resource type registry and the codec generated from declared fields"""
+import unittest
+import json
+from search_backend import search
+import common_functions
+from common_functions import JSON_FIELD, HASH_FIELD, ID_HASH_FIELD
+from resource_types import ResourceType, register_resource_type, get_resource_types
+import search_algorithm
+import search_dataset
+
+
+class ResourceTypeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.resource_type = ResourceType('paper', 'papers', 'paperId', [('paperId', search.TextField),
+                                                                          ('abstract', search.HtmlField),
+                                                                          ('title', search.TextField)])
+        self.record = {'paperId': 'paperId1', 'abstract': '<p>abstract</p>', 'title': 'title1'}
+
+    def test_is_record(self):
+        """Tests if only dictionary of exactly the declared string fields with legitimate id is accepted"""
+        self.assertTrue(self.resource_type.is_record(self.record))
+        for malformed in [None, [], {}, dict(self.record, year='2016'), dict(self.record, title=1),
+                          dict(self.record, paperId='paper 1'), dict(self.record, paperId='!paper1'),
+                          dict(self.record, paperId=''), dict(self.record, paperId=u'paper\u00e91'),
+                          dict(self.record, paperId='p' * 501)]:
+            self.assertFalse(self.resource_type.is_record(malformed), msg='Malformed %r is accepted' % malformed)
+
+    def test_create_document(self):
+        """Tests if document has declared fields of declared classes, date, hashes and stored JSON of the record"""
+        document = self.resource_type.create_document(self.record)
+        self.assertEqual('paperId1', document.doc_id)
+        self.assertEqual(['paperId', 'abstract', 'title', 'date', HASH_FIELD, ID_HASH_FIELD, JSON_FIELD],
+                         [field.name for field in document.fields])
+        self.assertIsInstance(document.field('abstract'), search.HtmlField)
+        self.assertDictEqual(self.record, json.loads(self.resource_type.document_to_json(document)))
+
+    def test_create_document_json_limit(self):
+        """Tests if JSON is stored only while the whole document stays under the 1 MB limit of the search service"""
+        padding = len(json.dumps(dict(self.record, title='')))
+        largest = dict(self.record, title='t' * (common_functions._MAXIMUM_JSON_FIELD_BYTES - padding))
+        self.assertEqual(common_functions._MAXIMUM_JSON_FIELD_BYTES, len(json.dumps(largest)))
+        document = self.resource_type.create_document(largest)
+        self.assertIsNotNone(document.field(JSON_FIELD), msg='JSON of the largest record is not stored')
+        document_bytes = sum(len(field.name) + len(unicode(field.value).encode('utf-8')) for field in document.fields)
+        self.assertLess(document_bytes, common_functions._MAXIMUM_DOCUMENT_BYTES, msg='Document is over 1 MB')
+        larger = dict(largest, title=largest['title'] + 't')
+        document = self.resource_type.create_document(larger)
+        self.assertRaises(ValueError, document.field, JSON_FIELD)
+        self.assertDictEqual(larger, json.loads(self.resource_type.document_to_json(document)))
+
+    def test_document_to_record(self):
+        """Tests if only declared fields are returned and projected id is taken from doc_id"""
+        document = self.resource_type.create_document(self.record)
+        self.assertDictEqual(self.record, self.resource_type.document_to_record(document))
+        self.assertDictEqual({'title': 'title1'}, self.resource_type.document_to_record(document, ['title']))
+        projected = search.Document(doc_id='paperId1', fields=[search.TextField(name='title', value='title1')])
+        self.assertDictEqual({'paperId': 'paperId1', 'title': 'title1'},
+                             self.resource_type.document_to_record(projected, ['paperId', 'title']))
+        legacy = search.Document(doc_id='paperId1', fields=[search.TextField(name='paperId', value='paperId1'),
+                                                            search.TextField(name='title', value='title1'),
+                                                            search.TextField(name='undeclared', value='x')])
+        self.assertDictEqual({'paperId': 'paperId1', 'title': 'title1'},
+                             json.loads(self.resource_type.document_to_json(legacy)),
+                             msg='JSON of document without stored JSON is not built from the declared fields')
+
+    def test_first_field_is_id(self):
+        """Tests if declaration without id as the first field is refused"""
+        with self.assertRaises(ValueError):
+            ResourceType('paper', 'papers', 'paperId', [('title', search.TextField), ('paperId', search.TextField)])
+
+    def test_registry(self):
+        """Tests if algorithms and datasets are registered and the same index can not be registered twice"""
+        self.assertItemsEqual([search_algorithm.ALGORITHM, search_dataset.DATASET], get_resource_types())
+        with self.assertRaises(ValueError):
+            register_resource_type(ResourceType('algorithm2', search_algorithm._INDEX_STRING, 'algorithmId',
+                                                [('algorithmId', search.TextField)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
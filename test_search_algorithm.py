@@ -12,8 +12,15 @@ sys.path.insert(1, '/root/Downloads/google-cloud-sdk/platform/google_appengine/l
 import unittest
 import webtest
 import main
+import metrics
+import resource_api
 import search_algorithm
+import search_all
 import json
+import urllib
+import zlib
+import webob
+import common_functions
 from google.appengine.ext import testbed
 from google.appengine.api import search
 from datetime import datetime
@@ -64,12 +71,38 @@ class SearchTestCaseErrorHandlers(unittest.TestCase):
         self.assertEqual('application/json', response.content_type)
 
 
+class FailedDeleteFuture(object):
+    """Future of delete_async whose result is DeleteError with a transient error of every document"""
+    def __init__(self, document_ids):
+        self.document_ids = document_ids
+
+    def get_result(self):
+        raise search.DeleteError('one or more delete document operations failed',
+                                 [search.DeleteResult(code=search.OperationResult.TRANSIENT_ERROR)
+                                  for _ in self.document_ids])
+
+
+class FailingDeleteIndex(search.Index):
+    """Index whose first failures delete_async calls fail for every document"""
+    def __init__(self, name, failures):
+        super(FailingDeleteIndex, self).__init__(name=name)
+        self.failures = failures
+
+    def delete_async(self, document_ids, deadline=None):
+        if self.failures > 0:
+            self.failures -= 1
+            return FailedDeleteFuture(document_ids)
+        return super(FailingDeleteIndex, self).delete_async(document_ids, deadline=deadline)
+
+
 class SearchTestCaseAlgorithmsHandler(unittest.TestCase):
     def setUp(self):
         self.testapp = webtest.TestApp(main.application)
         self.testbed = testbed.Testbed()
         self.testbed.activate()
         self.testbed.init_search_stub()
+        search_algorithm.algorithm_cache.clear()
+        search_algorithm.algorithm_query_cache.clear()
 
     def tearDown(self):
         self.testbed.deactivate()
@@ -254,6 +287,301 @@ class SearchTestCaseAlgorithmsHandler(unittest.TestCase):
         self.assertEqual(len(right_answer_list), len(result), msg='Wrong number of algorithms')
         self.assertItemsEqual(right_answer_list, result, msg='Discrepancy in returned algorithms')
 
+    def test_AlgorithmsHandler_GETStream101Algorithms(self):
+        """Tests if 101 algorithms are returned as one JSON array from streamed response
+        101 is significant because <index_object>.get_range() returns only 100 results per page"""
+        right_list = []
+        create_test_algorithm_list(right_list, 101)
+        documents = []
+        create_test_documents_list(right_list, documents, 101)
+        index = search.Index(name=search_algorithm._INDEX_STRING)
+        index.put(documents)
+        response = self.testapp.get('/algorithms/?stream=true')
+        self.assertEqual(200, response.status_int)
+        self.assertEqual('application/json', response.content_type)
+        self.assertItemsEqual(right_list, json.loads(response.normal_body.decode(encoding=response.charset)))
+
+    def test_AlgorithmsHandler_GETStreamEmpty(self):
+        """Tests if empty JSON array is streamed from empty database"""
+        response = self.testapp.get('/algorithms/?stream=true')
+        self.assertEqual(200, response.status_int)
+        self.assertEqual('[]', response.normal_body.decode(encoding=response.charset))
+
+    def test_AlgorithmsHandler_GETStreamBoolean(self):
+        """Tests if stream parameter is boolean, streamed response has no ETag unlike the cached one"""
+        for url in ['/algorithms/?stream', '/algorithms/?stream=1', '/algorithms/?stream=True']:
+            response = self.testapp.get(url)
+            self.assertEqual(200, response.status_int, msg='Wrong answer code for ' + url)
+            self.assertIsNone(response.etag, msg='Not streamed ' + url)
+        for url in ['/algorithms/?stream=0', '/algorithms/?stream=false']:
+            response = self.testapp.get(url)
+            self.assertEqual(200, response.status_int, msg='Wrong answer code for ' + url)
+            self.assertIsNotNone(response.etag, msg='Streamed ' + url)
+        response = self.testapp.get('/algorithms/?stream=maybe', expect_errors=True)
+        self.assertEqual(400, response.status_int)
+
+    def test_AlgorithmsHandler_GETStreamMalformedQuery(self):
+        """Tests if 400 is returned for malformed query of streamed and cached listing instead of error after 200"""
+        for url in ['/algorithms/?query=(&stream=1', '/algorithms/?query=(']:
+            response = self.testapp.get(url, expect_errors=True)
+            self.assertEqual(400, response.status_int, msg='Wrong answer code for ' + url)
+            self.assertEqual('application/json', response.content_type)
+            self.assertIn('Malformed Data', response.normal_body.decode(encoding=response.charset))
+
+    def test_AlgorithmsHandler_GETIds(self):
+        """Tests if algorithms with given ids are returned from 101 algorithms database together with missing ids"""
+        right_list = []
+        create_test_algorithm_list(right_list, 101)
+        documents = []
+        create_test_documents_list(right_list, documents, 101)
+        index = search.Index(name=search_algorithm._INDEX_STRING)
+        index.put(documents)
+        response = self.testapp.get('/algorithms/?ids=algorithmId100,xyz1,algorithmId7')
+        self.assertEqual(200, response.status_int)
+        self.assertEqual('application/json', response.content_type)
+        result = json.loads(response.normal_body.decode(encoding=response.charset))
+        self.assertListEqual([right_list[100], right_list[7]], result['found'], msg='Discrepancy in found algorithms')
+        self.assertListEqual(['xyz1'], result['missing'], msg='Discrepancy in missing ids')
+
+    def test_AlgorithmsHandler_GETIdsMalformed(self):
+        """Tests if 400 is returned if any of ids is not legitimate algorithmId"""
+        response = self.testapp.get('/algorithms/?ids=algorithmId1,!xyz', expect_errors=True)
+        self.assertEqual(400, response.status_int)
+        self.assertIn('Malformed Data', response.normal_body.decode(encoding=response.charset))
+
+    def test_AlgorithmsHandler_GETQueryCachedAndInvalidated(self):
+        """Tests if repeated query with different whitespaces is served from cache and POST makes it outdated"""
+        data_list = []
+        create_test_algorithm_list(data_list, 2)
+        self.testapp.post('/algorithms/', params=json.dumps(data_list), content_type='application/json; charset=utf-8')
+        response = self.testapp.get('/algorithms/?query=displayName0 OR displayName1')
+        self.assertItemsEqual(data_list, json.loads(response.normal_body.decode(encoding=response.charset)))
+        hits = search_algorithm.algorithm_query_cache.hits
+        response = self.testapp.get('/algorithms/?query=displayName0  OR   displayName1')
+        self.assertItemsEqual(data_list, json.loads(response.normal_body.decode(encoding=response.charset)))
+        self.assertEqual(hits + 1, search_algorithm.algorithm_query_cache.hits,
+                         msg='Second query was not served from cache')
+        data_list[0]['linkURL'] = 'newLinkURL'
+        self.testapp.post('/algorithms/', params=json.dumps(data_list[0]),
+                          content_type='application/json; charset=utf-8')
+        response = self.testapp.get('/algorithms/?query=displayName0 OR displayName1')
+        self.assertItemsEqual(data_list, json.loads(response.normal_body.decode(encoding=response.charset)),
+                              msg='Cached result was returned after POST')
+
+    def test_AlgorithmsHandler_GETIfNoneMatch(self):
+        """Tests if 304 without body is returned when If-None-Match has ETag of unchanged list
+        and if the list is returned again after POST"""
+        data_list = []
+        create_test_algorithm_list(data_list, 2)
+        self.testapp.post('/algorithms/', params=json.dumps(data_list), content_type='application/json; charset=utf-8')
+        response = self.testapp.get('/algorithms/')
+        etag = response.headers['ETag']
+        response = self.testapp.get('/algorithms/', headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_int, msg='Unchanged list was returned again')
+        self.assertEqual('', response.normal_body)
+        data_list[0]['linkURL'] = 'newLinkURL'
+        self.testapp.post('/algorithms/', params=json.dumps(data_list[0]),
+                          content_type='application/json; charset=utf-8')
+        response = self.testapp.get('/algorithms/', headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int, msg='Changed list was not returned')
+        self.assertNotEqual(etag, response.headers['ETag'])
+        self.assertItemsEqual(data_list, json.loads(response.normal_body.decode(encoding=response.charset)))
+
+    def test_AlgorithmsHandler_GETGzip(self):
+        """Tests if large list is compressed for client accepting gzip with its own ETag and small one is not.
+        Requests are made without webtest because it decodes the content."""
+        right_list = []
+        create_test_algorithm_list(right_list, 101)
+        documents = []
+        create_test_documents_list(right_list, documents, 101)
+        search.Index(name=search_algorithm._INDEX_STRING).put(documents)
+        # end of data preparation
+        plain_response = webob.Request.blank('/algorithms/').get_response(main.application)
+        self.assertNotIn('Content-Encoding', plain_response.headers)
+        response = webob.Request.blank('/algorithms/', headers={'Accept-Encoding': 'gzip, deflate'}).get_response(
+            main.application)
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertLess(len(response.body), len(plain_response.body) / 4, msg='List was not compressed well')
+        self.assertEqual(plain_response.body, zlib.decompress(response.body, 16 + zlib.MAX_WBITS))
+        self.assertNotEqual(plain_response.headers['ETag'], response.headers['ETag'])
+        response = webob.Request.blank('/algorithms/', headers={'Accept-Encoding': 'gzip',
+                                                               'If-None-Match': response.headers['ETag']}).get_response(
+            main.application)
+        self.assertEqual(304, response.status_int, msg='Unchanged compressed list was returned again')
+        response = webob.Request.blank('/algorithms/algorithmId0', headers={'Accept-Encoding': 'gzip'}).get_response(
+            main.application)
+        self.assertNotIn('Content-Encoding', response.headers, msg='Small body was compressed')
+        response = self.testapp.get('/algorithms/', headers={'Accept-Encoding': 'gzip'})
+        self.assertItemsEqual(right_list, json.loads(response.normal_body.decode(encoding=response.charset)))
+
+    def test_AlgorithmsHandler_GETStreamGzip(self):
+        """Tests if streamed list is compressed to one gzip stream"""
+        right_list = []
+        create_test_algorithm_list(right_list, 101)
+        documents = []
+        create_test_documents_list(right_list, documents, 101)
+        search.Index(name=search_algorithm._INDEX_STRING).put(documents)
+        # end of data preparation
+        response = webob.Request.blank('/algorithms/?stream=1', headers={'Accept-Encoding': 'gzip'}).get_response(
+            main.application)
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertItemsEqual(right_list, json.loads(zlib.decompress(response.body, 16 + zlib.MAX_WBITS)))
+
+    def test_AlgorithmsHandler_GETNdjson(self):
+        """Tests if list, page and ids are returned one algorithm per line for Accept: application/x-ndjson
+        and JSON stays the default"""
+        right_list = []
+        create_test_algorithm_list(right_list, 101)
+        documents = []
+        create_test_documents_list(right_list, documents, 101)
+        search.Index(name=search_algorithm._INDEX_STRING).put(documents)
+        # end of data preparation
+        headers = {'Accept': 'application/x-ndjson'}
+        response = self.testapp.get('/algorithms/', headers=headers)
+        self.assertEqual('application/x-ndjson', response.content_type)
+        lines = response.body.decode(encoding=response.charset).split('\n')
+        self.assertEqual('', lines[-1], msg='Last line is not terminated')
+        self.assertItemsEqual(right_list, [json.loads(line) for line in lines[:-1]])
+        response = self.testapp.get('/algorithms/?limit=40', headers=headers)
+        self.assertEqual(40, len(response.body.decode(encoding=response.charset).splitlines()))
+        response = self.testapp.get('/algorithms/?ids=algorithmId0,xyz1,algorithmId7', headers=headers)
+        self.assertEqual('application/x-ndjson', response.content_type)
+        lines = response.body.decode(encoding=response.charset).splitlines()
+        self.assertListEqual([right_list[0], right_list[7]], [json.loads(line) for line in lines])
+        self.assertEqual('xyz1', response.headers['Missing-Ids'])
+        self.assertIn('Missing-Ids', response.headers['Access-Control-Expose-Headers'])
+        response = self.testapp.get('/algorithms/', headers={'Accept': '*/*'})
+        self.assertEqual('application/json', response.content_type)
+
+    def test_AlgorithmsHandler_GETNdjsonMalformedQuery(self):
+        """Tests if 400 is returned for malformed query of NDJSON listing instead of error after 200"""
+        response = self.testapp.get('/algorithms/?query=(', headers={'Accept': 'application/x-ndjson'},
+                                    expect_errors=True)
+        self.assertEqual(400, response.status_int)
+        self.assertIn('Malformed Data', response.normal_body.decode(encoding=response.charset))
+
+    def test_AlgorithmsHandler_GETStoredJson(self):
+        """Tests if algorithms posted with stored JSON are listed with and without query, the stored JSON
+        does not match words of the query and is not returned as a field"""
+        data_list = []
+        create_test_algorithm_list(data_list, 150)
+        self.testapp.post('/algorithms/', params=json.dumps(data_list), content_type='application/json; charset=utf-8')
+        # legacy document indexed without the stored JSON is listed too
+        legacy_list = [{'algorithmId': 'legacyId', 'algorithmSummary': 'legacySummary', 'displayName': 'legacyName',
+                        'linkURL': 'legacyURL'}]
+        documents = []
+        create_test_documents_list(legacy_list, documents, 1)
+        index = search.Index(name=search_algorithm._INDEX_STRING)
+        index.put(documents)
+        self.assertIsNotNone(index.get('algorithmId0').field(common_functions.JSON_FIELD))
+        # end of data preparation
+        response = self.testapp.get('/algorithms/')
+        self.assertItemsEqual(data_list + legacy_list, json.loads(response.normal_body.decode(encoding=response.charset)))
+        response = self.testapp.get('/algorithms/?stream=1', headers={'Accept': 'application/x-ndjson'})
+        self.assertItemsEqual(data_list + legacy_list,
+                              [json.loads(line) for line in response.body.decode(encoding=response.charset).splitlines()])
+        response = self.testapp.get('/algorithms/?query=displayName7')
+        self.assertListEqual([data_list[7]], json.loads(response.normal_body.decode(encoding=response.charset)))
+        response = self.testapp.get('/algorithms/?query=algorithmSummary')
+        self.assertListEqual([], json.loads(response.normal_body.decode(encoding=response.charset)),
+                             msg='Stored JSON matches the query')
+        response = self.testapp.get('/algorithms/algorithmId7')
+        self.assertDictEqual(data_list[7], json.loads(response.normal_body.decode(encoding=response.charset)))
+
+    def test_AlgorithmsHandler_GETOrder(self):
+        """Tests if whole listing is in ascending algorithmId order regardless of the order of posting"""
+        data_list = []
+        create_test_algorithm_list(data_list, 3)
+        for i in [2, 0, 1]:
+            self.testapp.post('/algorithms/', params=json.dumps(data_list[i]),
+                              content_type='application/json; charset=utf-8')
+        # end of data preparation
+        for url in ['/algorithms/', '/algorithms/?stream=1']:
+            response = self.testapp.get(url)
+            self.assertListEqual(data_list, json.loads(response.normal_body.decode(encoding=response.charset)),
+                                 msg='Wrong order of ' + url)
+        response = self.testapp.get('/algorithms/', headers={'Accept': 'application/x-ndjson'})
+        self.assertListEqual(data_list, [json.loads(line) for line in
+                                         response.body.decode(encoding=response.charset).splitlines()])
+
+    def test_AlgorithmsHandler_GETMsgpack(self):
+        """Tests if JSON is returned for Accept: application/msgpack which is not offered"""
+        response = self.testapp.get('/algorithms/', headers={'Accept': 'application/msgpack'})
+        self.assertEqual('application/json', response.content_type)
+
+    def test_AlgorithmsHandler_GETPagesOf101Algorithms(self):
+        """Tests if 101 algorithms are returned in pages of 40 by following Next-Cursor header
+        and if Total-Count and Total-Pages headers are filled"""
+        right_list = []
+        create_test_algorithm_list(right_list, 101)
+        documents = []
+        create_test_documents_list(right_list, documents, 101)
+        index = search.Index(name=search_algorithm._INDEX_STRING)
+        index.put(documents)
+        # end of data preparation
+        result = []
+        response = self.testapp.get('/algorithms/?limit=40')
+        pages = 1
+        while 'Next-Cursor' in response.headers:
+            self.assertEqual(200, response.status_int)
+            self.assertEqual('101', response.headers['Total-Count'], msg='Wrong Total-Count header')
+            self.assertEqual('3', response.headers['Total-Pages'], msg='Wrong Total-Pages header')
+            page = json.loads(response.normal_body.decode(encoding=response.charset))
+            self.assertEqual(40, len(page), msg='Wrong number of algorithms in the page')
+            result.extend(page)
+            response = self.testapp.get('/algorithms/?limit=40&cursor=' +
+                                        urllib.quote(response.headers['Next-Cursor']))
+            pages += 1
+        result.extend(json.loads(response.normal_body.decode(encoding=response.charset)))
+        self.assertEqual(3, pages, msg='Wrong number of pages')
+        self.assertItemsEqual(right_list, result, msg='Discrepancy in returned algorithms')
+
+    def test_AlgorithmsHandler_GETPageMalformedLimit(self):
+        """Tests if 400 is returned if limit is not a number or is out of range"""
+        for limit in ['abc', '0', '1001']:
+            response = self.testapp.get('/algorithms/?limit=' + limit, expect_errors=True)
+            self.assertEqual(400, response.status_int, msg='Wrong answer code for limit=' + limit)
+            self.assertIn('Malformed Data', response.normal_body.decode(encoding=response.charset))
+
+    def test_AlgorithmsHandler_GETFields(self):
+        """Tests if only requested fields are returned by listing, query, page, stream and ids requests"""
+        right_list = []
+        create_test_algorithm_list(right_list, 101)
+        documents = []
+        create_test_documents_list(right_list, documents, 101)
+        search.Index(name=search_algorithm._INDEX_STRING).put(documents)
+        # end of data preparation
+        # listings without query are in ascending doc_id order, pages are in the order of rank
+        right_list.sort(key=lambda data: data['algorithmId'])
+        projected_list = [{'displayName': data['displayName'], 'linkURL': data['linkURL']} for data in right_list]
+        ids_list = [{'algorithmId': data['algorithmId']} for data in right_list]
+        for url in ['/algorithms/?fields=displayName,linkURL', '/algorithms/?stream=1&fields=linkURL,displayName',
+                    '/algorithms/?fields=algorithmId', '/algorithms/?stream=1&fields=algorithmId']:
+            response = self.testapp.get(url)
+            right = ids_list if url.endswith('algorithmId') else projected_list
+            self.assertListEqual(right, json.loads(response.normal_body.decode(encoding=response.charset)),
+                                 msg='Wrong fields or order returned by ' + url)
+            if 'stream' in url:
+                self.assertIsNone(response.etag, msg='Not streamed ' + url)
+        response = self.testapp.get('/algorithms/?limit=1000&fields=displayName,linkURL')
+        self.assertItemsEqual(projected_list, json.loads(response.normal_body.decode(encoding=response.charset)))
+        response = self.testapp.get('/algorithms/?limit=1000&fields=algorithmId')
+        self.assertItemsEqual(ids_list, json.loads(response.normal_body.decode(encoding=response.charset)))
+        response = self.testapp.get('/algorithms/?query=algorithmId23&fields=algorithmId,displayName')
+        self.assertEqual([{'algorithmId': 'algorithmId23', 'displayName': 'displayName23'}],
+                         json.loads(response.normal_body.decode(encoding=response.charset)))
+        response = self.testapp.get('/algorithms/?ids=algorithmId5,xyz1&fields=linkURL')
+        self.assertDictEqual({'found': [{'linkURL': 'linkURL5'}], 'missing': ['xyz1']},
+                             json.loads(response.normal_body.decode(encoding=response.charset)))
+
+    def test_AlgorithmsHandler_GETFieldsMalformed(self):
+        """Tests if 400 is returned for unknown field name"""
+        for fields in ['date', 'displayName,xyz', ',']:
+            response = self.testapp.get('/algorithms/?fields=' + fields, expect_errors=True)
+            self.assertEqual(400, response.status_int, msg='Wrong answer code for fields=' + fields)
+            self.assertIn('Malformed Data', response.normal_body.decode(encoding=response.charset))
+
     def test_AlgorithmsHandler_POST(self):
         data={}
         data['algorithmId'] = 'aId'
@@ -274,6 +602,112 @@ class SearchTestCaseAlgorithmsHandler(unittest.TestCase):
         self.assertEqual('lURL', test_document.field('linkURL').value)
         self.assertGreaterEqual(datetime.now(), test_document.field('date').value)
 
+    def test_AlgorithmsHandler_POSTBulk450Algorithms(self):
+        """Tests if JSON array of 450 algorithms is indexed in batches and result of every algorithm is returned.
+        450 is significant because <index_object>.put() accepts max 200 documents"""
+        data_list = []
+        create_test_algorithm_list(data_list, 450)
+        response = self.testapp.post('/algorithms/', params=json.dumps(data_list),
+                                     content_type='application/json; charset=utf-8')
+        self.assertEqual(200, response.status_int, msg='Wrong answer code')
+        self.assertEqual('application/json', response.content_type)
+        results = json.loads(response.normal_body.decode(encoding=response.charset))
+        self.assertEqual(450, len(results), msg='Wrong number of results')
+        for data, result in zip(data_list, results):
+            self.assertEqual(data['algorithmId'], result['algorithmId'])
+            self.assertEqual('OK', result['code'])
+        self.assertItemsEqual(data_list, search_algorithm.query_algorithms(search.Index(
+            name=search_algorithm._INDEX_STRING)), msg='Discrepancy in indexed algorithms')
+
+    def test_AlgorithmsHandler_POSTBulkMalformedAndDuplicated(self):
+        """Tests if malformed algorithm in JSON array is reported and not indexed while the others are
+        and if the later of duplicated algorithms wins"""
+        data_list = []
+        create_test_algorithm_list(data_list, 3)
+        data_list[1]['algorithmId'] = 'a' + ' ' + 'Id'
+        duplicate = dict(data_list[0])
+        duplicate['linkURL'] = 'newLinkURL'
+        data_list.append(duplicate)
+        response = self.testapp.post('/algorithms/', params=json.dumps(data_list),
+                                     content_type='application/json; charset=utf-8')
+        self.assertEqual(200, response.status_int, msg='Wrong answer code')
+        results = json.loads(response.normal_body.decode(encoding=response.charset))
+        self.assertEqual(['OK', 'INVALID_REQUEST', 'OK', 'OK'], [result['code'] for result in results])
+        index = search.Index(name=search_algorithm._INDEX_STRING)
+        self.assertIsNone(index.get('a Id'), msg='Malformed algorithm was indexed')
+        self.assertEqual('newLinkURL', index.get('algorithmId0').field('linkURL').value)
+        self.assertEqual(2, len(index.get_range(ids_only=True).results), msg='Wrong number of indexed algorithms')
+
+    def test_AlgorithmsHandler_POSTBulkRefusedIds(self):
+        """Tests if algorithms with ids or values refused by search.Document are reported as INVALID_REQUEST
+        instead of failing the whole request"""
+        data_list = []
+        create_test_algorithm_list(data_list, 5)
+        data_list[1]['algorithmId'] = u'algorithmId\u00e91'
+        data_list[2]['algorithmId'] = 'a' * 501
+        data_list[3]['algorithmSummary'] = 's' * (1024 * 1024 + 1)
+        response = self.testapp.post('/algorithms/', params=json.dumps(data_list),
+                                     content_type='application/json; charset=utf-8')
+        self.assertEqual(200, response.status_int, msg='Wrong answer code')
+        results = json.loads(response.normal_body.decode(encoding=response.charset))
+        self.assertEqual(['OK', 'INVALID_REQUEST', 'INVALID_REQUEST', 'INVALID_REQUEST', 'OK'],
+                         [result['code'] for result in results])
+        self.assertEqual(data_list[1]['algorithmId'], results[1]['algorithmId'])
+        response = self.testapp.post('/algorithms/', params=json.dumps(data_list[1]),
+                                     content_type='application/json; charset=utf-8', expect_errors=True)
+        self.assertEqual(400, response.status_int, msg='Wrong answer code of single algorithm')
+        response = self.testapp.post('/algorithms/', params=json.dumps(data_list[3]),
+                                     content_type='application/json; charset=utf-8', expect_errors=True)
+        self.assertEqual(400, response.status_int, msg='Wrong answer code of single algorithm')
+
+    def test_AlgorithmsHandler_POSTUnchanged(self):
+        """Tests if re-posted algorithms equal to the indexed ones are not indexed again and numbers of created,
+        updated and unchanged algorithms are returned"""
+        data_list = []
+        create_test_algorithm_list(data_list, 5)
+        response = self.testapp.post('/algorithms/', params=json.dumps(data_list[:4]),
+                                     content_type='application/json; charset=utf-8')
+        self.assertEqual(('4', '0', '0'), (response.headers['Created-Count'], response.headers['Updated-Count'],
+                                           response.headers['Unchanged-Count']))
+        self.assertEqual('Created-Count, Updated-Count, Unchanged-Count',
+                         response.headers['Access-Control-Expose-Headers'], msg='Counts are not readable by browsers')
+        index = search.Index(name=search_algorithm._INDEX_STRING)
+        dates = dict((document.doc_id, document.field('date').value) for document in index.get_range())
+        data_list[1]['displayName'] = 'newDisplayName'
+        response = self.testapp.post('/algorithms/', params=json.dumps(data_list),
+                                     content_type='application/json; charset=utf-8')
+        results = json.loads(response.normal_body.decode(encoding=response.charset))
+        self.assertEqual(['unchanged', 'updated', 'unchanged', 'unchanged', 'created'],
+                         [result['status'] for result in results])
+        self.assertEqual(['OK'] * 5, [result['code'] for result in results])
+        self.assertEqual(('1', '1', '3'), (response.headers['Created-Count'], response.headers['Updated-Count'],
+                                           response.headers['Unchanged-Count']))
+        self.assertEqual(dates['algorithmId0'], index.get('algorithmId0').field('date').value,
+                         msg='Unchanged algorithm was indexed again')
+        self.assertEqual('newDisplayName', index.get('algorithmId1').field('displayName').value)
+        response = self.testapp.post('/algorithms/', params=json.dumps(data_list[1]),
+                                     content_type='application/json; charset=utf-8')
+        self.assertEqual(200, response.status_int)
+        self.assertEqual('1', response.headers['Unchanged-Count'])
+        response = self.testapp.get('/algorithms/?limit=10')
+        self.assertItemsEqual(data_list, json.loads(response.normal_body.decode(encoding=response.charset)),
+                              msg='Hash is returned as a field')
+
+    def test_AlgorithmsHandler_POSTUnchangedSameIds(self):
+        """Tests if algorithms with the same id in one array are compared with the earlier ones and ids with
+        characters of the query syntax are found"""
+        data = {'algorithmId': 'a(b)"c:OR', 'algorithmSummary': 'algorithmSummary', 'displayName': 'displayName',
+                'linkURL': 'linkURL'}
+        changed = dict(data, displayName='newDisplayName')
+        response = self.testapp.post('/algorithms/', params=json.dumps([data, data, changed, data]),
+                                     content_type='application/json; charset=utf-8')
+        self.assertEqual(['created', 'unchanged', 'updated', 'updated'],
+                         [result['status'] for result in json.loads(response.normal_body)])
+        response = self.testapp.post('/algorithms/', params=json.dumps(data),
+                                     content_type='application/json; charset=utf-8')
+        self.assertEqual(('0', '0', '1'), (response.headers['Created-Count'], response.headers['Updated-Count'],
+                                           response.headers['Unchanged-Count']))
+
     def test_AlgorithmsHandler_POSTError400WrongContentType(self):
         data={}
         data['algorithmId'] = 'aId'
@@ -323,6 +757,25 @@ class SearchTestCaseAlgorithmsHandler(unittest.TestCase):
         result = index.get_range(ids_only=True)
         self.assertEqual(0, len(result.results), msg='There ware algorithms present after DELETE')
 
+    def test_AlgorithmsHandler_DELETEFailed(self):
+        """Tests if 500 is returned if some algorithms are not deleted even when retried"""
+        my_list = []
+        create_test_algorithm_list(my_list, 101)
+        documents = []
+        create_test_documents_list(my_list, documents, 101)
+        index = FailingDeleteIndex(search_algorithm._INDEX_STRING, 2)
+        index.put(documents)
+        original = resource_api.get_index
+        resource_api.get_index = lambda name: index
+        try:
+            response = self.testapp.delete('/algorithms/', expect_errors=True)
+        finally:
+            resource_api.get_index = original
+        self.assertEqual(500, response.status_int, msg='Wrong response code')
+        self.assertIn('Algorithms Not Deleted', response.normal_body.decode(encoding='UTF-8'))
+        result = index.get_range(ids_only=True, limit=200)
+        self.assertEqual(101, len(result.results), msg='Not deleted algorithms are missing')
+
 
 class SearchTestCaseAlgorithmsIdHandler(unittest.TestCase):
     def setUp(self):
@@ -330,6 +783,8 @@ class SearchTestCaseAlgorithmsIdHandler(unittest.TestCase):
         self.testbed = testbed.Testbed()
         self.testbed.activate()
         self.testbed.init_search_stub()
+        search_algorithm.algorithm_cache.clear()
+        search_algorithm.algorithm_query_cache.clear()
 
     def tearDown(self):
         self.testbed.deactivate()
@@ -359,6 +814,56 @@ class SearchTestCaseAlgorithmsIdHandler(unittest.TestCase):
         self.assertEqual(4, len(json.loads(response.normal_body.decode(encoding='UTF-8'))), msg='There returned algorithm has more keys then 4')
         self.assertDictEqual(searched_algorithm, json.loads(response.normal_body.decode(encoding='UTF-8')), msg='Returned data was not searched algorithm')
 
+    def test_AlgorithmsIdHandler_GET_CachedAndInvalidated(self):
+        """Tests if the second GET of the same algorithm is served from cache and POST and DELETE invalidate it"""
+        data = {}
+        data['algorithmId'] = 'aId'
+        data['algorithmSummary'] = 'aSummary'
+        data['displayName'] = 'dName'
+        data['linkURL'] = 'lURL'
+        self.testapp.post('/algorithms/', params=json.dumps(data), content_type='application/json; charset=utf-8')
+        self.testapp.get('/algorithms/aId')
+        hits = search_algorithm.algorithm_cache.hits
+        response = self.testapp.get('/algorithms/aId')
+        self.assertDictEqual(data, json.loads(response.normal_body.decode(encoding='UTF-8')))
+        self.assertEqual(hits + 1, search_algorithm.algorithm_cache.hits, msg='Second GET was not served from cache')
+        data['linkURL'] = 'newLURL'
+        self.testapp.post('/algorithms/', params=json.dumps(data), content_type='application/json; charset=utf-8')
+        response = self.testapp.get('/algorithms/aId')
+        self.assertDictEqual(data, json.loads(response.normal_body.decode(encoding='UTF-8')),
+                             msg='Cached algorithm was returned after POST')
+        self.testapp.delete('/algorithms/aId')
+        response = self.testapp.get('/algorithms/aId', expect_errors=True)
+        self.assertEqual(404, response.status_int, msg='Cached algorithm was returned after DELETE')
+
+    def test_AlgorithmsIdHandler_GET_IfNoneMatch(self):
+        """Tests if 304 is returned when If-None-Match has ETag of unchanged algorithm"""
+        right_list = []
+        create_test_algorithm_list(right_list, 1)
+        documents = []
+        create_test_documents_list(right_list, documents, 1)
+        search.Index(name=search_algorithm._INDEX_STRING).put(documents)
+        response = self.testapp.get('/algorithms/algorithmId0')
+        self.assertIn('ETag', response.headers)
+        response = self.testapp.get('/algorithms/algorithmId0', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(304, response.status_int, msg='Unchanged algorithm was returned again')
+        response = self.testapp.get('/algorithms/algorithmId0', headers={'If-None-Match': '"otherETag"'})
+        self.assertEqual(200, response.status_int)
+        self.assertDictEqual(right_list[0], json.loads(response.normal_body.decode(encoding='UTF-8')))
+
+    def test_AlgorithmsIdHandler_GET_Fields(self):
+        """Tests if only requested fields of algorithm are returned and unknown field is 400"""
+        right_list = []
+        create_test_algorithm_list(right_list, 1)
+        documents = []
+        create_test_documents_list(right_list, documents, 1)
+        search.Index(name=search_algorithm._INDEX_STRING).put(documents)
+        response = self.testapp.get('/algorithms/algorithmId0?fields=displayName,algorithmId')
+        self.assertDictEqual({'algorithmId': 'algorithmId0', 'displayName': 'displayName0'},
+                             json.loads(response.normal_body.decode(encoding='UTF-8')))
+        response = self.testapp.get('/algorithms/algorithmId0?fields=date', expect_errors=True)
+        self.assertEqual(400, response.status_int)
+
     def test_AlgorithmsIdHandler_GET_Empty(self):
         """Tests if nothing is found in an empty database while searching for algorithmId xyz1"""
         searchedId='xyz1'
@@ -435,6 +940,116 @@ class SearchTestCaseAlgorithmsIdHandler(unittest.TestCase):
         self.assertIn('Malformed Data', response.normal_body.decode(encoding='UTF-8'))
 
 
+class RPCCounter(object):
+    """
+    Counts search index calls made by handlers while it is active. Index objects returned by get_index() of search
+    modules are wrapped by metrics.InstrumentedIndex which reports every call to add_rpc().
+    Usage: with RPCCounter() as counter: <request>, then counter.calls is {call name: number of calls}
+    """
+    _MODULES = [resource_api, search_all]
+
+    def __init__(self):
+        self.calls = {}
+        self._originals = []
+
+    def add_rpc(self, index_name, call, seconds):
+        self.calls[call] = self.calls.get(call, 0) + 1
+
+    def total(self):
+        return sum(self.calls.values())
+
+    def __enter__(self):
+        for module in self._MODULES:
+            original = module.get_index
+            self._originals.append((module, original))
+            module.get_index = lambda name, original=original: metrics.InstrumentedIndex(original(name), self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for module, original in self._originals:
+            module.get_index = original
+        self._originals = []
+
+
+class RPCBudgetTestCase(unittest.TestCase):
+    """Base of test cases asserting maximum number of search index calls of a request"""
+
+    def assertRPCBudget(self, budget, method, url, **kwargs):
+        """
+        Makes request with self.testapp and fails if handler made more than budget search index calls
+        :param budget: maximum number of calls
+        :param method: name of webtest.TestApp method e.g. 'get'
+        :param url:
+        :param kwargs: passed to the method
+        :rtype: webtest.TestResponse
+        """
+        with RPCCounter() as counter:
+            response = getattr(self.testapp, method)(url, **kwargs)
+        self.assertLessEqual(counter.total(), budget,
+                             msg='%s %s made %d search calls %r, budget is %d' % (method.upper(), url, counter.total(),
+                                                                                 counter.calls, budget))
+        return response
+
+
+class SearchTestCaseRPCBudget(RPCBudgetTestCase):
+    """Maximum numbers of search index calls per endpoint and data size"""
+    def setUp(self):
+        self.testapp = webtest.TestApp(main.application)
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        self.testbed.init_search_stub()
+        search_algorithm.algorithm_cache.clear()
+        search_algorithm.algorithm_query_cache.clear()
+
+    def tearDown(self):
+        self.testbed.deactivate()
+
+    def put_algorithms(self, length):
+        """Indexes length test algorithms outside of the counted requests"""
+        data_list = []
+        create_test_algorithm_list(data_list, length)
+        # documents are created as the API does, with the stored JSON
+        documents = [search_algorithm.create_document(data['algorithmId'], data['algorithmSummary'],
+                                                      data['displayName'], data['linkURL']) for data in data_list]
+        index = search.Index(name=search_algorithm._INDEX_STRING)
+        for start in range(0, length, 200):
+            index.put(documents[start:start + 200])
+        return data_list
+
+    def test_RPCBudget_GET(self):
+        """Tests budgets of GET requests for 1, 101 and 1001 algorithms"""
+        for length in [1, 101, 1001]:
+            search_algorithm.algorithm_cache.clear()
+            search_algorithm.algorithm_query_cache.clear()
+            self.put_algorithms(length)
+            # pages of 100 and at most one empty page at the end
+            self.assertRPCBudget(length // 100 + 2, 'get', '/algorithms/')
+            self.assertRPCBudget(0, 'get', '/algorithms/')
+            self.assertRPCBudget(length // 100 + 2, 'get', '/algorithms/?stream=1')
+            self.assertRPCBudget(1, 'get', '/algorithms/?limit=100')
+            self.assertRPCBudget(1, 'get', '/algorithms/algorithmId0')
+            self.assertRPCBudget(0, 'get', '/algorithms/algorithmId0')
+            self.assertRPCBudget(3, 'get', '/algorithms/?ids=algorithmId0,xyz1,xyz2')
+            self.assertRPCBudget(2, 'get', '/search/?query=algorithmId0')
+
+    def test_RPCBudget_POST_DELETE(self):
+        """Tests budgets of writing requests for 1 and 450 algorithms"""
+        data_list = []
+        create_test_algorithm_list(data_list, 450)
+        # search of the indexed hash by id and put
+        self.assertRPCBudget(2, 'post', '/algorithms/', params=json.dumps(data_list[0]),
+                             content_type='application/json; charset=utf-8')
+        # searches of 40 ids and puts of 200
+        self.assertRPCBudget(12 + 3, 'post', '/algorithms/', params=json.dumps(data_list),
+                             content_type='application/json; charset=utf-8')
+        # unchanged algorithms are not indexed again
+        self.assertRPCBudget(12, 'post', '/algorithms/', params=json.dumps(data_list),
+                             content_type='application/json; charset=utf-8')
+        self.assertRPCBudget(1, 'delete', '/algorithms/algorithmId0')
+        # 3 get_range pages of 200 of the remaining 449 algorithms, the empty one and a delete of every page
+        self.assertRPCBudget(3 + 1 + 3, 'delete', '/algorithms/')
+
+
 class SearchTestCaseUnittest(unittest.TestCase):
     """ Test Case for unittests without webtest"""
     def setUp(self):
@@ -445,11 +1060,46 @@ class SearchTestCaseUnittest(unittest.TestCase):
     def tearDown(self):
         self.testbed.deactivate()
 
+    def test_get_documents_in_flight(self):
+        """Tests if at most gets_in_flight gets run at once and documents are returned in the order of ids"""
+        my_list = []
+        create_test_algorithm_list(my_list, 30)
+        documents = []
+        create_test_documents_list(my_list, documents, 30)
+        index = search.Index(name=search_algorithm._INDEX_STRING)
+        index.put(documents)
+        in_flight = []
+
+        class CountedFuture(object):
+            def __init__(self, future):
+                self.future = future
+                in_flight.append(self)
+
+            def get_result(self):
+                in_flight.remove(self)
+                return self.future.get_result()
+
+        class CountingIndex(object):
+            def __init__(self):
+                self.maximum = 0
+
+            def get_async(self, doc_id):
+                future = CountedFuture(index.get_async(doc_id))
+                self.maximum = max(self.maximum, len(in_flight))
+                return future
+
+        counting_index = CountingIndex()
+        doc_ids = [data['algorithmId'] for data in my_list] + ['xyz1']
+        found = common_functions.get_documents(counting_index, doc_ids, gets_in_flight=4)
+        self.assertEqual(4, counting_index.maximum, msg='Wrong number of gets in flight')
+        self.assertEqual(doc_ids[:-1], [document.doc_id for document in found[:-1]])
+        self.assertIsNone(found[-1])
+
     def test_has_no_whitespaces(self):
         stringOK = 'stringOK'
         stringNOK = stringOK + '\n'
-        self.assertTrue(search_algorithm.has_no_whitespaces(stringOK), msg='There ware whitespaces detected in legitimate string')
-        self.assertFalse(search_algorithm.has_no_whitespaces(stringNOK), msg='The whitespace was not detected in string with whitespaces')
+        self.assertTrue(common_functions.has_no_whitespaces(stringOK), msg='There ware whitespaces detected in legitimate string')
+        self.assertFalse(common_functions.has_no_whitespaces(stringNOK), msg='The whitespace was not detected in string with whitespaces')
 
     def test_is_algorithm_dict_legitimate(self):
         data={}
@@ -481,11 +1131,11 @@ class SearchTestCaseUnittest(unittest.TestCase):
         result = search_algorithm.del_algorithm(index, searched_id)
         self.assertEqual(0, result, msg='Algorithm was not deleted properly')
         self.assertNotEqual(1, result, msg='Algorithm was there but was not deleted properly')
-        self.assertNotEqual(2, result, msg='Algorithm was not there before delete')
         self.assertIsNone(index.get(searched_id), msg='Algorithm is still there after "successful" deletion')
 
     def test_del_algorithm_NotFound(self):
-        """Tests if function returns '2' while deletingnonexistent algorithmId 'xyz1'"""
+        """Tests if function returns '0' while deleting nonexistent algorithmId 'xyz1'
+        Deleting nonexistent document is successful in one delete RPC"""
         searched_id = 'xyz1'
         right_list = []
         create_test_algorithm_list(right_list, 101)
@@ -496,9 +1146,25 @@ class SearchTestCaseUnittest(unittest.TestCase):
         # end of preparing data
         self.assertIsNone(index.get(searched_id), msg='Algorithm is there but should not be')
         result = search_algorithm.del_algorithm(index, searched_id)
-        self.assertEqual(2, result, msg='Wrong return code')
+        self.assertEqual(0, result, msg='Wrong return code')
         self.assertIsNone(index.get(searched_id), msg='Algorithm is still there')
 
+    def test_del_algorithms_from250algorithms(self):
+        """Tests if list of 220 algorithm ids is deleted in batches from database containing 250 algorithms
+        220 is significant because <index_object>.delete() accepts max 200 ids"""
+        my_list = []
+        create_test_algorithm_list(my_list, 250)
+        documents = []
+        create_test_documents_list(my_list, documents, 250)
+        index = search.Index(name=search_algorithm._INDEX_STRING)
+        index.put(documents[:200])
+        index.put(documents[200:])
+        ids = [data['algorithmId'] for data in my_list[:219]] + ['xyz1']
+        result = search_algorithm.del_algorithms(index, ids)
+        self.assertEqual([0] * 220, result, msg='Wrong return codes')
+        remaining = search_algorithm.query_algorithms(index)
+        self.assertItemsEqual(my_list[219:], remaining, msg='Discrepancy in remaining algorithms')
+
     def test_get_algorithm_Found(self):
         """Tests if algorithm is returned from an 102 algorithms database while searching for
         existent algorithmId xyz1"""
@@ -626,6 +1292,43 @@ class SearchTestCaseUnittest(unittest.TestCase):
         self.assertEqual(len(right_answer_list), len(result), msg='Wrong number of algorithms')
         self.assertItemsEqual(right_answer_list, result, msg='Discrepancy in returned algorithms')
 
+    def test_query_algorithms_page_queryfrom200Algorithms(self):
+        """Tests if query_algorithms_page returns first page, cursor of next page and number of all found algorithms
+        """
+        query_string = 'algorithm'
+        right_list = []
+        create_test_algorithm_list(right_list, 200)
+        for algorithm in right_list:
+            algorithm['displayName'] = 'algorithm ' + algorithm['displayName'].split('displayName')[1]
+        documents = []
+        create_test_documents_list(right_list, documents, 200)
+        index = search.Index(name=search_algorithm._INDEX_STRING)
+        index.put(documents)
+        result, next_cursor, total_count = search_algorithm.query_algorithms_page(index, query_string, 150)
+        self.assertEqual(150, len(result), msg='Wrong number of algorithms')
+        self.assertEqual(200, total_count, msg='Wrong number of found algorithms')
+        self.assertIsNotNone(next_cursor, msg='There is no cursor of the next page')
+        last_page, next_cursor, total_count = search_algorithm.query_algorithms_page(index, query_string, 150,
+                                                                                     next_cursor)
+        self.assertEqual(50, len(last_page), msg='Wrong number of algorithms in the last page')
+        self.assertIsNone(next_cursor, msg='There is cursor after the last page')
+        self.assertItemsEqual(right_list, result + last_page, msg='Discrepancy in returned algorithms')
+
+    def test_iter_algorithms_records_queryfrom200Algorithms(self):
+        """Tests if streamed JSON chunks form the same list as returned by query_algorithms"""
+        query_string = 'algorithm'
+        right_list = []
+        create_test_algorithm_list(right_list, 200)
+        for algorithm in right_list:
+            algorithm['displayName'] = 'algorithm ' + algorithm['displayName'].split('displayName')[1]
+        documents = []
+        create_test_documents_list(right_list, documents, 200)
+        index = search.Index(name=search_algorithm._INDEX_STRING)
+        index.put(documents)
+        chunks = list(search_algorithm.iter_algorithms_records(index, query_string))
+        self.assertLess(3, len(chunks), msg='The result was not written page after page')
+        self.assertItemsEqual(right_list, json.loads(''.join(chunks)), msg='Discrepancy in returned algorithms')
+
     def test_create_document(self):
         """ Checks proper creation of google.appengine.api.search.Document"""
         algorithm_id = 'alid'
@@ -655,5 +1358,51 @@ class SearchTestCaseUnittest(unittest.TestCase):
         result = index.get_range(ids_only=True)
         self.assertEqual(0, len(result.results), msg='There ware algorithms present after del_all')
 
+    def test_del_all_from1001algorithms_progress(self):
+        """Tests if all of 1001 algorithms are deleted in pipelined batches of 200 and progress is reported"""
+        my_list = []
+        create_test_algorithm_list(my_list, 1001)
+        documents = []
+        create_test_documents_list(my_list, documents, 1001)
+        index = search.Index(name=search_algorithm._INDEX_STRING)
+        for start in range(0, 1001, 200):
+            index.put(documents[start:start + 200])
+        reported = []
+        stats = search_algorithm.del_all(index, progress=lambda s: reported.append(s['deleted']))
+        self.assertEqual(1001, stats['deleted'], msg='Wrong number of deleted algorithms')
+        self.assertEqual(0, stats['failed'], msg='Some algorithms were not deleted')
+        self.assertEqual(6, stats['batches'], msg='Wrong number of delete batches')
+        self.assertEqual([200, 400, 600, 800, 1000, 1001], reported, msg='Wrong progress reported')
+        result = index.get_range(ids_only=True)
+        self.assertEqual(0, len(result.results), msg='There ware algorithms present after del_all')
+
+    def test_del_all_retries_failed_batch(self):
+        """Tests if algorithms of a failed delete batch are deleted by the retry"""
+        my_list = []
+        create_test_algorithm_list(my_list, 301)
+        documents = []
+        create_test_documents_list(my_list, documents, 301)
+        index = FailingDeleteIndex(search_algorithm._INDEX_STRING, 1)
+        index.put(documents[:200])
+        index.put(documents[200:])
+        stats = search_algorithm.del_all(index)
+        self.assertEqual(301, stats['deleted'], msg='Wrong number of deleted algorithms')
+        self.assertEqual(0, stats['failed'], msg='Some algorithms were not deleted')
+        self.assertEqual(3, stats['batches'], msg='Wrong number of delete batches')
+        result = index.get_range(ids_only=True)
+        self.assertEqual(0, len(result.results), msg='There ware algorithms present after del_all')
+
+    def test_del_all_failed(self):
+        """Tests if algorithms failing also in the retry are counted as failed"""
+        my_list = []
+        create_test_algorithm_list(my_list, 101)
+        documents = []
+        create_test_documents_list(my_list, documents, 101)
+        index = FailingDeleteIndex(search_algorithm._INDEX_STRING, 2)
+        index.put(documents)
+        stats = search_algorithm.del_all(index)
+        self.assertEqual(0, stats['deleted'], msg='Wrong number of deleted algorithms')
+        self.assertEqual(101, stats['failed'], msg='Wrong number of not deleted algorithms')
+
 if __name__ == '__main__':
     unittest.main()
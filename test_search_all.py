@@ -0,0 +1,75 @@
+"""It's very important to install in virtualenv
+pip install WebTest
+also either insert google_appengine, webapp jinja and yaml libraries in PyCharm library script
+according to this https://www.enkisoftware.com/devlogpost-20141231-1-Python_Google_App_Engine_debugging_with_PyCharm_CE
+"""
+import unittest
+import webtest
+import main
+import search_algorithm
+import search_dataset
+import json
+from google.appengine.ext import testbed
+from google.appengine.api import search
+
+
+def put_test_documents(index_string, id_key, summary_key, texts):
+    """Puts one document of given display name text for every text in texts to index by name index_string"""
+    documents = []
+    for i, text in enumerate(texts):
+        doc_id = id_key + str(i)
+        documents.append(search.Document(doc_id=doc_id,
+                                         fields=[
+                                             search.TextField(name=id_key, value=doc_id),
+                                             search.HtmlField(name=summary_key, value='summary'),
+                                             search.TextField(name='displayName', value=text),
+                                             search.TextField(name='linkURL', value='linkURL' + str(i))
+                                         ]))
+    search.Index(name=index_string).put(documents)
+
+
+class SearchTestCaseSearchHandler(unittest.TestCase):
+    def setUp(self):
+        self.testapp = webtest.TestApp(main.application)
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        self.testbed.init_search_stub()
+        put_test_documents(search_algorithm._INDEX_STRING, 'algorithmId', 'algorithmSummary',
+                           ['sort numbers', 'sort sort sort numbers', 'sum numbers', 'graph'])
+        put_test_documents(search_dataset._INDEX_STRING, 'datasetId', 'datasetSummary',
+                           ['sort sort numbers', 'numbers', 'graph'])
+
+    def tearDown(self):
+        self.testbed.deactivate()
+
+    def test_SearchHandler_GET(self):
+        """Tests if results of both indexes are returned in one list ordered by score with type and number found"""
+        response = self.testapp.get('/search/?query=sort')
+        self.assertEqual(200, response.status_int)
+        data = json.loads(response.normal_body.decode(encoding=response.charset))
+        self.assertDictEqual({'algorithm': 2, 'dataset': 1}, data['found'])
+        self.assertEqual([('dataset', 'datasetId0'), ('algorithm', 'algorithmId1'), ('algorithm', 'algorithmId0')],
+                         [(result['type'], result.get('algorithmId', result.get('datasetId')))
+                          for result in data['results']],
+                         msg='Results are not ordered by score')
+        scores = [result['score'] for result in data['results']]
+        self.assertEqual(sorted(scores, reverse=True), scores)
+        self.assertEqual('sort sort numbers', data['results'][0]['displayName'])
+
+    def test_SearchHandler_GETLimitPerType(self):
+        """Tests if limit is applied to every type separately while number found is not limited"""
+        response = self.testapp.get('/search/?query=numbers&limit=1')
+        data = json.loads(response.normal_body.decode(encoding=response.charset))
+        self.assertDictEqual({'algorithm': 3, 'dataset': 2}, data['found'])
+        self.assertItemsEqual(['algorithm', 'dataset'], [result['type'] for result in data['results']])
+
+    def test_SearchHandler_GETMalformed(self):
+        """Tests if 400 is returned for malformed query, limit or unknown parameter"""
+        for url in ['/search/?query=(sort', '/search/?limit=0', '/search/?xyz=1']:
+            response = self.testapp.get(url, expect_errors=True)
+            self.assertEqual(400, response.status_int, msg='Wrong answer code for ' + url)
+            self.assertIn('Malformed Data', response.normal_body.decode(encoding=response.charset))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""Tests of index snapshots"""
+import unittest
+import gzip
+import json
+from datetime import date
+from io import BytesIO
+from google.appengine.ext import testbed
+from google.appengine.api import search
+import memory_search
+import snapshot
+import search_algorithm
+
+
+def put_test_algorithms(index, length):
+    """Indexes length test algorithms with create_document and returns their documents"""
+    documents = []
+    for i in range(length):
+        documents.append(search_algorithm.create_document('algorithmId' + str(i), 'algorithmSummary' + str(i),
+                                                          'displayName' + str(i), 'linkURL' + str(i)))
+    for start in range(0, length, 200):
+        index.put(documents[start:start + 200])
+    return documents
+
+
+def document_values(document):
+    return (document.doc_id, document.rank, [(type(field).__name__, field.name, field.value)
+                                             for field in document.fields])
+
+
+class SnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        self.testbed.init_search_stub()
+
+    def tearDown(self):
+        self.testbed.deactivate()
+        memory_search.clear_all()
+
+    def test_export_restore(self):
+        """Tests if all documents with all fields including date are restored to another index"""
+        index = search.Index(name=search_algorithm._INDEX_STRING)
+        documents = put_test_algorithms(index, 450)
+        documents.append(search.Document(doc_id='other', rank=7, fields=[
+            search.AtomField(name='atom', value='a b'), search.NumberField(name='number', value=1.5),
+            search.DateField(name='day', value=date(2016, 5, 1)), search.TextField(name='text', value=u'\xf3w')]))
+        index.put(documents[-1])
+        snapshot_file = BytesIO()
+        stats = snapshot.export_index(index, snapshot_file)
+        self.assertEqual((451, 3), (stats['documents'], stats['chunks']), msg='Wrong number of documents or chunks')
+        lines = gzip.GzipFile(fileobj=BytesIO(snapshot_file.getvalue())).read().splitlines()
+        self.assertEqual('algorithms', json.loads(lines[0])['index'])
+        restored_index = search.Index(name='restored')
+        stats = snapshot.restore_index(restored_index, BytesIO(snapshot_file.getvalue()), batches_in_flight=2)
+        self.assertEqual((451, 0, 3), (stats['restored'], stats['failed'], stats['batches']))
+        restored = restored_index.get_range(limit=1000)
+        self.assertEqual([document_values(document) for document in index.get_range(limit=1000)],
+                         [document_values(document) for document in restored])
+
+    def test_restore_to_memory_backend(self):
+        """Tests if snapshot of the search service is restored to memory backend"""
+        put_test_algorithms(search.Index(name=search_algorithm._INDEX_STRING), 250)
+        snapshot_file = BytesIO()
+        snapshot.export_index(search.Index(name=search_algorithm._INDEX_STRING), snapshot_file)
+        memory_index = memory_search.Index(name=search_algorithm._INDEX_STRING)
+        snapshot.restore_index(memory_index, BytesIO(snapshot_file.getvalue()))
+        self.assertEqual(250, len(search_algorithm.query_algorithms(memory_index)))
+        self.assertDictEqual({'algorithmId': 'algorithmId7', 'algorithmSummary': 'algorithmSummary7',
+                              'displayName': 'displayName7', 'linkURL': 'linkURL7'},
+                             search_algorithm.get_algorithm(memory_index, 'algorithmId7'))
+
+    def test_restore_not_snapshot(self):
+        """Tests if file which is not snapshot is refused"""
+        not_snapshot = BytesIO()
+        gzip_file = gzip.GzipFile(fileobj=not_snapshot, mode='wb')
+        gzip_file.write('{"documents": []}\n')
+        gzip_file.close()
+        with self.assertRaises(ValueError):
+            snapshot.restore_index(search.Index(name='restored'), BytesIO(not_snapshot.getvalue()))
+
+    def test_remote_api_opt_in(self):
+        """Tests if Remote API is enabled only by remote.yaml and not by the default deployment descriptor"""
+        from google.appengine.api import appinfo
+        with open('app.yaml') as app_yaml:
+            self.assertIsNone(appinfo.LoadSingleAppInfo(app_yaml).builtins)
+        with open('remote.yaml') as remote_yaml:
+            remote_info = appinfo.LoadSingleAppInfo(remote_yaml)
+        self.assertEqual('remote', remote_info.service)
+        self.assertEqual('on', remote_info.builtins[0].remote_api)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""It's very important to install in virtualenv
+pip install WebTest
+also either insert google_appengine, webapp jinja and yaml libraries in PyCharm library script
+according to this https://www.enkisoftware.com/devlogpost-20141231-1-Python_Google_App_Engine_debugging_with_PyCharm_CE
+"""
+import unittest
+import webtest
+import json
+import swagger
+from google.appengine.ext import testbed
+
+
+class SwaggerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.testapp = webtest.TestApp(swagger.app)
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        swagger.swagger_cache.clear()
+
+    def tearDown(self):
+        self.testbed.deactivate()
+
+    def test_swagger_json(self):
+        """Tests if spec is returned with host and schemes of get_search_url() and with ETag"""
+        response = self.testapp.get('/swagger.json')
+        self.assertEqual(200, response.status_int)
+        self.assertEqual('application/json', response.content_type)
+        data = json.loads(response.normal_body)
+        self.assertEqual('localhost:8080', data['host'])
+        self.assertEqual(['http'], data['schemes'])
+        self.assertIn('/algorithms/', data['paths'])
+        self.assertIn('ETag', response.headers)
+
+    def test_swagger_json_cached(self):
+        """Tests if spec is serialized once per url and 304 is returned for If-None-Match with its ETag"""
+        response = self.testapp.get('/swagger.json')
+        hits = swagger.swagger_cache.hits
+        second_response = self.testapp.get('/swagger.json')
+        self.assertEqual(hits + 1, swagger.swagger_cache.hits, msg='Spec was serialized again')
+        self.assertEqual(response.body, second_response.body)
+        response = self.testapp.get('/swagger.json', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(304, response.status_int)
+        self.assertEqual('', response.body)
+
+
+if __name__ == '__main__':
+    unittest.main()
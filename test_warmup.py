@@ -0,0 +1,54 @@
+"""It's very important to install in virtualenv
+pip install WebTest
+also either insert google_appengine, webapp jinja and yaml libraries in PyCharm library script
+according to this https://www.enkisoftware.com/devlogpost-20141231-1-Python_Google_App_Engine_debugging_with_PyCharm_CE
+"""
+import unittest
+import webtest
+import json
+import main
+import swagger
+import search_backend
+import search_algorithm
+import search_dataset
+from google.appengine.ext import testbed
+from google.appengine.api import search
+
+
+class WarmupTestCase(unittest.TestCase):
+    def setUp(self):
+        self.testapp = webtest.TestApp(main.application)
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        self.testbed.init_search_stub()
+        search_algorithm.algorithm_query_cache.clear()
+        search_dataset.dataset_query_cache.clear()
+        swagger.swagger_cache.clear()
+
+    def tearDown(self):
+        self.testbed.deactivate()
+
+    def test_warmup(self):
+        """Tests if warmup request loads swagger.json and caches listings of both indexes"""
+        search.Index(name=search_algorithm._INDEX_STRING).put(
+            search_algorithm.create_document('algorithmId0', 'algorithmSummary0', 'displayName0', 'linkURL0'))
+        response = self.testapp.get('/_ah/warmup')
+        self.assertEqual(200, response.status_int)
+        self.assertItemsEqual(['swagger', 'algorithms', 'datasets'], json.loads(response.normal_body).keys())
+        self.assertIsNotNone(swagger._spec)
+        self.assertEqual(1, swagger.swagger_cache.stats()['size'])
+        self.assertEqual(1, search_algorithm.algorithm_query_cache.stats()['size'])
+        self.assertEqual(1, search_dataset.dataset_query_cache.stats()['size'])
+        hits = search_algorithm.algorithm_query_cache.hits
+        response = self.testapp.get('/algorithms/')
+        self.assertEqual(1, len(json.loads(response.normal_body)))
+        self.assertEqual(hits + 1, search_algorithm.algorithm_query_cache.hits, msg='Listing was not cached by warmup')
+
+    def test_index_objects_built_once(self):
+        """Tests if the same search.Index object is returned for the same name"""
+        self.assertIs(search_backend.get_index(search_algorithm._INDEX_STRING),
+                      search_backend.get_index(search_algorithm._INDEX_STRING))
+
+
+if __name__ == '__main__':
+    unittest.main()
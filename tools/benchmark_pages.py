@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""Measures wall-clock time of reading whole index page by page with different prefetch depths.
+
+Runs on the in-process memory backend with simulated RPC latency, so it does not need App Engine:
+    python tools/benchmark_pages.py --sizes 1000 10000 100000 --latency 0.02 --depths 0 1 2 4
+For every index size and depth it reads all documents with common_functions.iter_document_pages() and
+serializes every page to JSON like the listing handlers do, once by get_range and once by search cursor.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import memory_search
+import search_algorithm
+from common_functions import iter_document_pages
+
+
+def fill_index(index_object, size):
+    documents = []
+    for i in range(size):
+        documents.append(search_algorithm.create_document('algorithmId' + str(i), 'algorithmSummary' + str(i),
+                                                          'displayName' + str(i), 'linkURL' + str(i)))
+        if len(documents) == memory_search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST:
+            index_object.put(documents)
+            documents = []
+    if documents:
+        index_object.put(documents)
+
+
+def read_all(index_object, query_string, prefetch):
+    """Returns (seconds, number of documents) of reading and serializing all documents"""
+    start_time = time.time()
+    count = 0
+    for page in iter_document_pages(index_object, query_string, prefetch=prefetch):
+        json.dumps([search_algorithm.ALGORITHM.document_to_record(document) for document in page])
+        count += len(page)
+    return time.time() - start_time, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--depths', type=int, nargs='+', default=[0, 1, 2, 4])
+    parser.add_argument('--latency', type=float, default=0.02, help='simulated RPC round trip in seconds')
+    args = parser.parse_args()
+
+    print('%8s %-10s %6s %10s %10s' % ('docs', 'path', 'depth', 'seconds', 'speedup'))
+    for size in args.sizes:
+        memory_search.clear_all()
+        memory_search.set_rpc_latency(0.0)
+        index_object = memory_search.Index(name=search_algorithm._INDEX_STRING)
+        fill_index(index_object, size)
+        memory_search.set_rpc_latency(args.latency)
+        # search path is forced by query matching every document
+        for path, query_string in [('get_range', ''), ('search', 'NOT xyz1')]:
+            baseline = None
+            for depth in args.depths:
+                seconds, count = read_all(index_object, query_string, depth)
+                if count != size:
+                    raise SystemExit('Read %d documents of %d' % (count, size))
+                if baseline is None:
+                    baseline = seconds
+                print('%8d %-10s %6d %10.3f %9.2fx' % (size, path, depth, seconds, baseline / seconds))
+    memory_search.clear_all()
+
+
+if __name__ == '__main__':
+    main()
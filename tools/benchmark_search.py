@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""Benchmarks of hot paths of search_algorithm module with results comparable between commits.
+
+Runs on the in-process memory backend, so it does not need App Engine. Every benchmark is run on indexes seeded
+with the same synthetic algorithms, repeated and summarized by its minimum and median time:
+    python tools/benchmark_search.py --sizes 1000 10000 100000 --output before.json
+    python tools/benchmark_search.py --sizes 1000 10000 100000 --output after.json
+    python tools/benchmark_search.py --compare before.json after.json --threshold 0.2
+Compare exits with status 1 when the median of any benchmark present in both files got slower by more than
+threshold (0.2 is 20 %).
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import webtest
+import memory_search
+import search_backend
+import search_algorithm
+import main
+
+
+def create_benchmark_algorithm_list(data_list, length):
+    """Prepare benchmark data as list by name data_list given by reference
+     of length algorithm descriptions"""
+    for i in range(length):
+        data = {}
+        data['algorithmId'] = 'algorithmId' + str(i)
+        data['algorithmSummary'] = '<p>algorithmSummary' + str(i) + ' sort numbers of list</p>'
+        data['displayName'] = 'displayName' + str(i)
+        data['linkURL'] = 'linkURL' + str(i)
+        data_list.append(data)
+
+
+def seed_index(data_list):
+    """Returns memory index of algorithms containing only algorithms of data_list"""
+    memory_search.clear_all()
+    index_object = memory_search.Index(name=search_algorithm._INDEX_STRING)
+    search_algorithm.put_algorithms(index_object, data_list)
+    return index_object
+
+
+def measure(function, repeat, number=1, setup=None):
+    """
+    Returns list of seconds of one call of function in every of repeat runs of number calls
+    :param function: benchmarked function without arguments
+    :param repeat: number of runs
+    :param number: number of calls in one run
+    :param setup: function called before every run, not measured
+    """
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start_time = time.time()
+        for _ in range(number):
+            function()
+        runs.append((time.time() - start_time) / number)
+    return runs
+
+
+def summarize(runs):
+    ordered = sorted(runs)
+    return {"min": ordered[0], "median": ordered[len(ordered) // 2], "runs": len(ordered)}
+
+
+def clear_caches():
+    search_algorithm.algorithm_cache.clear()
+    search_algorithm.algorithm_query_cache.clear()
+
+
+def run_benchmarks(size, repeat):
+    """Returns {benchmark name: summary} of all benchmarks on index of size algorithms"""
+    data_list = []
+    create_benchmark_algorithm_list(data_list, size)
+    index_object = seed_index(data_list)
+    middle_id = data_list[size // 2]['algorithmId']
+    testapp = webtest.TestApp(main.application)
+    results = {}
+
+    def record(name, runs):
+        results['%s@%d' % (name, size)] = summarize(runs)
+
+    record('create_document', measure(lambda: search_algorithm.create_document(
+        'algorithmId0', 'algorithmSummary0', 'displayName0', 'linkURL0'), repeat, number=1000))
+    record('is_algorithm_dict', measure(lambda: search_algorithm.is_algorithm_dict(data_list[0]), repeat, number=1000))
+    record('get_algorithm', measure(lambda: search_algorithm.get_algorithm(index_object, middle_id), repeat,
+                                    number=1000))
+    record('query_algorithms', measure(lambda: search_algorithm.query_algorithms(index_object), repeat))
+    record('query_algorithms_query', measure(lambda: search_algorithm.query_algorithms(index_object, 'sort numbers'),
+                                             repeat))
+    record('handler_get_list', measure(lambda: testapp.get('/algorithms/'), repeat, setup=clear_caches))
+    record('handler_get_list_cached', measure(lambda: testapp.get('/algorithms/'), repeat))
+    record('handler_get_page', measure(lambda: testapp.get('/algorithms/?limit=100'), repeat))
+    record('handler_get_id', measure(lambda: clear_caches() or testapp.get('/algorithms/' + middle_id), repeat,
+                                     number=100))
+    # every run deletes freshly seeded index
+    seeded = []
+    record('del_all', measure(lambda: search_algorithm.del_all(seeded.pop()), repeat,
+                              setup=lambda: seeded.append(seed_index(data_list))))
+    memory_search.clear_all()
+    return results
+
+
+def compare(baseline, current, threshold):
+    """Prints medians of benchmarks of both results and returns names of benchmarks slower by more than threshold"""
+    regressions = []
+    print('%-32s %12s %12s %8s' % ('benchmark', 'baseline', 'current', 'change'))
+    for name in sorted(current['results']):
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['median']
+        after = current['results'][name]['median']
+        change = (after - before) / before if before > 0 else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = ' REGRESSION'
+        print('%-32s %12.6f %12.6f %+7.1f%%%s' % (name, before, after, change * 100, flag))
+    return regressions
+
+
+def main_function():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs of every benchmark')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated RPC round trip in seconds')
+    parser.add_argument('--output', help='file to write JSON results to instead of standard output')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help='compare two JSON results')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown of median, 0.2 is 20 %%')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as baseline_file:
+            baseline = json.load(baseline_file)
+        with open(args.compare[1]) as current_file:
+            current = json.load(current_file)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print('%d benchmarks slower by more than %d %%: %s' % (len(regressions), args.threshold * 100,
+                                                                   ', '.join(regressions)))
+            sys.exit(1)
+        return
+
+    search_backend.set_backend(search_backend.BACKEND_MEMORY)
+    memory_search.set_rpc_latency(args.latency)
+    output = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "sizes": args.sizes,
+                 "repeat": args.repeat, "latency": args.latency},
+        "results": {}
+    }
+    for size in args.sizes:
+        output["results"].update(run_benchmarks(size, args.repeat))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(output, output_file, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(output, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main_function()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""Measures start of a new instance: import of the application and its first request with and without warmup.
+
+Every run is a fresh Python process on the memory backend, so it does not need App Engine:
+    python tools/benchmark_startup.py --repeat 20 --output startup.json
+Results have the format of benchmark_search.py and can be compared with its --compare option:
+    import_main - import of main module which App Engine does on the first request of the instance
+    first_request - GET /algorithms/ right after the import
+    warmup - GET /_ah/warmup right after the import
+    first_request_after_warmup - GET /algorithms/ after the warmup request
+    swagger_first_request, swagger_after_warmup - GET /swagger.json without and with warmup
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def run_child(warm):
+    """Measures one start in this process, it must not have imported the application before"""
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    results = {}
+    start_time = time.time()
+    import main
+    results['import_main'] = time.time() - start_time
+    import webtest
+    import swagger
+    testapp = webtest.TestApp(main.application)
+    swagger_testapp = webtest.TestApp(swagger.app)
+    if warm:
+        start_time = time.time()
+        testapp.get('/_ah/warmup')
+        results['warmup'] = time.time() - start_time
+    for cold_name, warm_name, app, url in [
+            ('first_request', 'first_request_after_warmup', testapp, '/algorithms/'),
+            ('swagger_first_request', 'swagger_after_warmup', swagger_testapp, '/swagger.json')]:
+        start_time = time.time()
+        app.get(url)
+        results[warm_name if warm else cold_name] = time.time() - start_time
+    print(json.dumps(results))
+
+
+def measure_starts(repeat):
+    """Returns {benchmark name: list of seconds} of repeat cold and repeat warmed up starts"""
+    runs = {}
+    environment = dict(os.environ, SEARCH_BACKEND='memory')
+    for _ in range(repeat):
+        for mode in ['cold', 'warm']:
+            output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child', mode],
+                                             env=environment)
+            for name, seconds in json.loads(output.splitlines()[-1]).items():
+                runs.setdefault(name, []).append(seconds)
+    return runs
+
+
+def summarize(runs):
+    ordered = sorted(runs)
+    return {"min": ordered[0], "median": ordered[len(ordered) // 2], "runs": len(ordered)}
+
+
+def main_function():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10, help='number of started processes of every kind')
+    parser.add_argument('--output', help='file to write JSON results to instead of standard output')
+    parser.add_argument('--child', choices=['cold', 'warm'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.child == 'warm')
+        return
+    output = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "repeat": args.repeat},
+        "results": dict((name, summarize(runs)) for name, runs in measure_starts(args.repeat).items())
+    }
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(output, output_file, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(output, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main_function()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+"""Imports algorithms or datasets from NDJSON or CSV file to a running instance of the API.
+
+The file is read record by record, so its size is not limited by memory. Every record is validated like POST does
+and valid records are sent in JSON arrays of 200 (the maximum of one put to the index) with several requests
+in flight:
+    python tools/import_documents.py algorithm algorithms.ndjson --url https://<project>.appspot.com
+    python tools/import_documents.py dataset datasets.csv --url http://localhost:8080 --concurrency 8
+NDJSON has one JSON object per line. CSV has a header row with field names of the resource type.
+After every sent batch the position in the file up to which all batches were indexed is written to the checkpoint
+file (<file>.checkpoint by default). Running the same command again resumes from that position, so an interrupted
+import is not started over. Batches sent after the checkpoint are sent again, which is harmless because documents
+are replaced by doc_id. Use --restart to ignore the checkpoint.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+import urllib2
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import search_algorithm
+import search_dataset
+
+BATCH_SIZE = 200
+CONCURRENCY = 4
+RETRIES = 3
+FORMAT_NDJSON = 'ndjson'
+FORMAT_CSV = 'csv'
+# os.rename() of Python 2 on Windows fails if the target exists
+RENAME_REPLACES = os.name != 'nt'
+# resource types which can be imported
+RESOURCE_TYPES = [search_algorithm.ALGORITHM, search_dataset.DATASET]
+
+
+def get_resource_type(name):
+    """Returns resource type of RESOURCE_TYPES by its name e.g. algorithm"""
+    for resource_type in RESOURCE_TYPES:
+        if resource_type.name == name:
+            return resource_type
+    raise ValueError('Unknown resource type %s' % name)
+
+
+def iter_ndjson_records(source_file, offset=0):
+    """
+    Yields records of NDJSON file from byte offset
+    :param source_file: file opened in binary mode
+    :param offset: position in the file to start from
+    :rtype: generator: tuples (dict or None if the line is not JSON, offset after the record)
+    """
+    source_file.seek(offset)
+    # readline() instead of iteration keeps tell() exact
+    for line in iter(source_file.readline, ''):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield record, source_file.tell()
+
+
+def iter_csv_records(source_file, offset=0):
+    """
+    Yields records of CSV file with header row from byte offset
+    :param source_file: file opened in binary mode
+    :param offset: position in the file to start from, 0 or an offset yielded before
+    :rtype: generator: tuples (dict or None if the row has wrong number of columns, offset after the record)
+    """
+    source_file.seek(0)
+    field_names = [name.decode('utf-8') for name in next(csv.reader([source_file.readline()]))]
+    if offset:
+        source_file.seek(offset)
+    # reader gets the file line by line, so tell() is the end of the last row also for quoted multiline values
+    for row in csv.reader(iter(source_file.readline, '')):
+        if not row:
+            continue
+        if len(row) != len(field_names):
+            yield None, source_file.tell()
+        else:
+            yield dict(zip(field_names, [value.decode('utf-8') for value in row])), source_file.tell()
+
+
+def http_batch_sender(url, resource_type, retries=RETRIES, timeout=60):
+    """
+    Returns function posting JSON array of records to the collection of resource type at url. Failed requests are
+    retried with growing delay, the last error is raised.
+    :param url: scheme and host of the API e.g. http://localhost:8080
+    :param resource_type: resource_types.ResourceType
+    :rtype: function: list of dicts -> list of result dicts with code and message of every record
+    """
+    collection_url = url.rstrip('/') + '/' + resource_type.index_string + '/'
+
+    def post_batch(batch):
+        for attempt in range(retries + 1):
+            request = urllib2.Request(collection_url, json.dumps(batch), {'Content-Type': 'application/json'})
+            try:
+                return json.load(urllib2.urlopen(request, timeout=timeout))
+            except (urllib2.URLError, IOError, ValueError):
+                if attempt == retries:
+                    raise
+                time.sleep(2 ** attempt)
+    return post_batch
+
+
+def new_checkpoint(source_path, resource_type_name):
+    return {"source": os.path.abspath(source_path), "type": resource_type_name, "offset": 0,
+            "imported": 0, "failed": 0, "invalid": 0, "finished": False}
+
+
+def _read_checkpoint(checkpoint_path):
+    """Returns saved checkpoint or None. Without the checkpoint the complete temporary one left by save_checkpoint()
+    interrupted between removing the old checkpoint and renaming is used."""
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as checkpoint_file:
+            return json.load(checkpoint_file)
+    if os.path.exists(checkpoint_path + '.tmp'):
+        try:
+            with open(checkpoint_path + '.tmp') as checkpoint_file:
+                return json.load(checkpoint_file)
+        except ValueError:
+            # the first checkpoint was not written completely
+            return None
+    return None
+
+
+def load_checkpoint(checkpoint_path, source_path, resource_type_name):
+    """Returns saved checkpoint of import of the same file and resource type or a new one"""
+    checkpoint = new_checkpoint(source_path, resource_type_name)
+    saved = _read_checkpoint(checkpoint_path)
+    if saved is not None:
+        if saved.get('source') != checkpoint['source'] or saved.get('type') != resource_type_name:
+            raise ValueError('Checkpoint %s belongs to import of %s %s' % (checkpoint_path, saved.get('type'),
+                                                                           saved.get('source')))
+        checkpoint.update(saved)
+    return checkpoint
+
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    """Writes checkpoint so that a crash while writing leaves the previous one"""
+    temporary_path = checkpoint_path + '.tmp'
+    with open(temporary_path, 'w') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    if not RENAME_REPLACES and os.path.exists(checkpoint_path):
+        # the complete temporary checkpoint is read by load_checkpoint() if the import stops right here
+        os.remove(checkpoint_path)
+    os.rename(temporary_path, checkpoint_path)
+
+
+def import_records(records, resource_type, post_batch, checkpoint, save=None, batch_size=BATCH_SIZE,
+                   concurrency=CONCURRENCY):
+    """
+    Sends valid records in batches with at most concurrency batches in flight. Batches are finished in the order
+    they were read, so checkpoint offset is always the end of a prefix of the file which is indexed.
+    :param records: iterable of (dict or None, offset after the record) e.g. from iter_ndjson_records()
+    :param resource_type: resource_types.ResourceType validating the records
+    :param post_batch: function sending list of records and returning list of result dicts with code
+    :param checkpoint: dict with offset, imported, failed and invalid keys updated in place
+    :param save: optional function called with checkpoint whenever it changes
+    :rtype: dict: checkpoint
+    """
+    pool = ThreadPool(concurrency)
+    in_flight = deque()
+
+    def finish_oldest():
+        async_result, offset, invalid = in_flight.popleft()
+        results = []
+        if async_result is not None:
+            results = async_result.get()
+        for result in results:
+            if result.get('code') == 'OK':
+                checkpoint['imported'] += 1
+            else:
+                checkpoint['failed'] += 1
+                logging.warning('Not imported %s: %s %s', result.get(resource_type.id_key), result.get('code'),
+                                result.get('message'))
+        checkpoint['offset'] = offset
+        checkpoint['invalid'] += invalid
+        if save is not None:
+            save(checkpoint)
+
+    def send(batch, offset, invalid):
+        if len(in_flight) >= concurrency:
+            finish_oldest()
+        async_result = None
+        if batch:
+            async_result = pool.apply_async(post_batch, (batch,))
+        in_flight.append((async_result, offset, invalid))
+
+    batch = []
+    invalid = 0
+    offset = checkpoint['offset']
+    try:
+        for record, offset in records:
+            if resource_type.is_record(record):
+                batch.append(record)
+            else:
+                invalid += 1
+                logging.warning('Invalid record before offset %d: %r', offset, record)
+            if len(batch) == batch_size:
+                send(batch, offset, invalid)
+                batch = []
+                invalid = 0
+        # the last batch also covers invalid records at the end of the file
+        send(batch, offset, invalid)
+        while in_flight:
+            finish_oldest()
+    finally:
+        pool.terminate()
+        pool.join()
+    checkpoint['finished'] = True
+    if save is not None:
+        save(checkpoint)
+    return checkpoint
+
+
+def main_function():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('type', help='resource type: ' + ', '.join(resource_type.name
+                                                                    for resource_type in RESOURCE_TYPES))
+    parser.add_argument('source', help='NDJSON or CSV file')
+    parser.add_argument('--url', default='http://localhost:8080', help='scheme and host of the API')
+    parser.add_argument('--format', choices=[FORMAT_NDJSON, FORMAT_CSV],
+                        help='format of the file, by default by its extension')
+    parser.add_argument('--checkpoint', help='checkpoint file, <source>.checkpoint by default')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and import the whole file')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='records in one request, max 200')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='requests in flight')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    resource_type = get_resource_type(args.type)
+    source_format = args.format or (FORMAT_CSV if args.source.lower().endswith('.csv') else FORMAT_NDJSON)
+    checkpoint_path = args.checkpoint or args.source + '.checkpoint'
+    if args.restart:
+        checkpoint = new_checkpoint(args.source, resource_type.name)
+    else:
+        checkpoint = load_checkpoint(checkpoint_path, args.source, resource_type.name)
+    if checkpoint['finished']:
+        print('%s was already imported, use --restart to import it again' % args.source)
+        return
+    if checkpoint['offset']:
+        logging.info('Resuming at offset %d', checkpoint['offset'])
+
+    size = os.path.getsize(args.source)
+
+    def save(state):
+        save_checkpoint(checkpoint_path, state)
+        logging.info('%.1f %% imported %d failed %d invalid %d', 100.0 * state['offset'] / max(size, 1),
+                     state['imported'], state['failed'], state['invalid'])
+
+    iter_source_records = iter_csv_records if source_format == FORMAT_CSV else iter_ndjson_records
+    with open(args.source, 'rb') as source_file:
+        import_records(iter_source_records(source_file, checkpoint['offset']), resource_type,
+                       http_batch_sender(args.url, resource_type), checkpoint, save,
+                       batch_size=min(args.batch_size, BATCH_SIZE), concurrency=args.concurrency)
+    print(json.dumps(checkpoint, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main_function()
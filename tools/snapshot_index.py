@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""Exports search index to snapshot file or restores it from one, see snapshot module for the format.
+
+Indexes of a deployed application are reached by Remote API with Application Default Credentials of
+an administrator, so production data can be cloned to staging. Remote API is not enabled by app.yaml, it is
+the separate remote service of remote.yaml which shares the indexes of the application. Deploy it only for
+the copy and delete it afterwards:
+    gcloud app deploy remote.yaml --project <project>
+    python tools/snapshot_index.py export algorithms algorithms.snapshot.gz --remote remote-dot-<project>.appspot.com
+    python tools/snapshot_index.py restore algorithms algorithms.snapshot.gz \
+        --remote remote-dot-<staging-project>.appspot.com
+    gcloud app services delete remote --project <project>
+Use --insecure for the local development server started as dev_appserver.py app.yaml remote.yaml,
+the remote service listens on the next port, e.g. --remote localhost:8081 --insecure.
+Without --remote the in-process memory backend is used, which is useful only to check a snapshot file.
+Restore does not delete documents missing in the snapshot, DELETE the collection first for an exact clone.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import search_backend
+import snapshot
+
+
+def main_function():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['export', 'restore'])
+    parser.add_argument('index', help='name of the index e.g. algorithms or datasets')
+    parser.add_argument('file', help='snapshot file')
+    parser.add_argument('--remote', help='host of the application with Remote API')
+    parser.add_argument('--insecure', action='store_true', help='use http instead of https for --remote')
+    parser.add_argument('--batches-in-flight', type=int, default=snapshot.RESTORE_BATCHES_IN_FLIGHT,
+                        help='puts running at once while restoring')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    if args.remote:
+        from google.appengine.ext.remote_api import remote_api_stub
+        remote_api_stub.ConfigureRemoteApiForOAuth(args.remote, '/_ah/remote_api', secure=not args.insecure)
+        search_backend.set_backend(search_backend.BACKEND_FTS)
+    else:
+        search_backend.set_backend(search_backend.BACKEND_MEMORY)
+    index_object = search_backend.get_index(args.index)
+
+    def progress(stats):
+        logging.info(json.dumps(stats, sort_keys=True))
+
+    if args.command == 'export':
+        with open(args.file, 'wb') as output_file:
+            stats = snapshot.export_index(index_object, output_file, progress)
+    else:
+        with open(args.file, 'rb') as input_file:
+            stats = snapshot.restore_index(index_object, input_file, args.batches_in_flight, progress)
+    print(json.dumps(stats, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main_function()
@@ -0,0 +1,59 @@
+"""Warmup request handler run by App Engine before a new instance gets user requests.
+
+Modules of all handlers are imported by main, the warmup request additionally builds search.Index objects, reads
+the first page of every index, parses swagger.json and fills the cache of the whole listing of small indexes,
+so the first user request of the instance does not pay for it. Enabled by inbound_services: warmup in app.yaml.
+"""
+
+
+import json
+import logging
+import time
+
+import webapp2
+from search_backend import search, get_index
+import search_algorithm
+import search_dataset
+
+# whole listing is cached only for indexes with at most this many documents, larger ones do not fit the cache
+WARMUP_LIST_MAXIMUM = 5000
+# collections whose first page is read and whole listing is cached
+_COLLECTIONS = [search_algorithm.ALGORITHMS, search_dataset.DATASETS]
+
+
+def warm_up():
+    """
+    Prepares the instance for user requests. Errors of the search service are logged, the instance serves
+    requests anyway.
+    :rtype: dict: seconds spent on every step
+    """
+    stats = {}
+    start_time = time.time()
+    # swagger.app is a separate script of the same instance, its module is imported only here
+    import swagger
+    swagger.load_spec()
+    search_url = swagger.get_search_url()
+    if '://' in search_url:
+        swagger.get_swagger_json(search_url)
+    stats['swagger'] = time.time() - start_time
+    for collection in _COLLECTIONS:
+        start_time = time.time()
+        try:
+            index_object = get_index(collection.index_string)
+            _, _, number_found = collection.query_page(index_object)
+            if number_found <= WARMUP_LIST_MAXIMUM:
+                collection.query_json(index_object)
+        except search.Error:
+            logging.warning('Warmup of index %s failed', collection.index_string, exc_info=True)
+        stats[collection.index_string] = time.time() - start_time
+    logging.info('Warmup %s', json.dumps(stats, sort_keys=True))
+    return stats
+
+
+class WarmupHandler(webapp2.RequestHandler):
+    def get(self):
+        """GET /_ah/warmup sent by App Engine to a starting instance"""
+        stats = warm_up()
+        self.response.headers['Content-Type'] = 'application/json; charset=utf-8'
+        self.response.status = 200
+        self.response.out.write(json.dumps(stats))